@@ -2,7 +2,8 @@
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, users, health
+from app.api.v1.endpoints import auth, debug, files, health, jobs, users
+from app.core.config import settings
 
 api_router = APIRouter()
 
@@ -10,3 +11,8 @@ api_router = APIRouter()
 api_router.include_router(health.router, prefix="/health", tags=["health"])
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(files.router, prefix="/files", tags=["files"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
+if settings.PROFILING_ENABLED:
+    api_router.include_router(debug.router, prefix="/debug", tags=["debug"])
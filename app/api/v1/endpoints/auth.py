@@ -10,10 +10,22 @@ from app.core.config import settings
 from app.core.security import (
     create_access_token,
     create_refresh_token,
+    verify_email_token,
     verify_password,
     verify_token,
 )
-from app.schemas.common import Token, TokenPayload
+from app.schemas.common import (
+    EmailVerification,
+    PasswordRecovery,
+    PasswordReset,
+    ResponseModel,
+    Token,
+    TokenPayload,
+)
+from app.services.email_service import (
+    send_password_reset_email,
+    send_verification_email,
+)
 from app.services.user_service import UserService
 
 router = APIRouter()
@@ -87,6 +99,59 @@ async def refresh_token(
     }
 
 
+@router.post("/verify-email", response_model=ResponseModel[None])
+async def verify_email(
+    verification: EmailVerification,
+    user_service: UserService = Depends(),
+) -> Any:
+    """Confirm an email address with the token from the verification email."""
+    payload = verify_email_token(verification.token, "verify_email")
+    if not payload or not await user_service.mark_email_verified(payload["sub"]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired verification token",
+        )
+    return ResponseModel(message="Email verified successfully")
+
+
+@router.post(
+    "/password-recovery",
+    response_model=ResponseModel[None],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def recover_password(
+    recovery: PasswordRecovery,
+    user_service: UserService = Depends(),
+) -> Any:
+    """Email a password reset link.
+    
+    The response is the same whether or not the address belongs to a user.
+    """
+    user = await user_service.get_in_db_by_email(recovery.email)
+    if user and user.is_active:
+        send_password_reset_email(user)
+    return ResponseModel(
+        message="If the email is registered, a reset link has been sent"
+    )
+
+
+@router.post("/reset-password", response_model=ResponseModel[None])
+async def reset_password(
+    reset: PasswordReset,
+    user_service: UserService = Depends(),
+) -> Any:
+    """Set a new password with the token from the reset email."""
+    payload = verify_email_token(reset.token, "reset_password")
+    if not payload or not await user_service.reset_password(
+        payload["sub"], payload.get("pwd", ""), reset.new_password
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset token",
+        )
+    return ResponseModel(message="Password updated successfully")
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     user_service: UserService = Depends(),
@@ -118,6 +183,21 @@ async def get_current_active_user(
     return current_user
 
 
+@router.post(
+    "/verify-email/resend",
+    response_model=ResponseModel[None],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def resend_verification_email(
+    current_user: Any = Depends(get_current_active_user),
+) -> Any:
+    """Send the verification email again."""
+    if current_user.email_verified:
+        raise HTTPException(status_code=400, detail="Email already verified")
+    send_verification_email(current_user)
+    return ResponseModel(message="Verification email sent")
+
+
 async def get_current_active_superuser(
     current_user: Any = Depends(get_current_user),
 ) -> Any:
@@ -0,0 +1,78 @@
+"""Profiling endpoints (superuser only, mounted when profiling is enabled)."""
+
+import asyncio
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.endpoints.auth import get_current_active_superuser
+from app.core.config import settings
+from app.core.profiling import StackSampler, profile_store, window_lock
+from app.schemas.common import ResponseModel
+
+router = APIRouter()
+
+
+def _folded_response(collapsed: str, filename: str) -> PlainTextResponse:
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_window(
+    seconds: float = Query(10.0, gt=0),
+    interval: float = Query(settings.PROFILING_INTERVAL, gt=0, le=1),
+    current_user: Any = Depends(get_current_active_superuser),
+) -> PlainTextResponse:
+    """Sample every thread of this worker for a time window."""
+    if seconds > settings.PROFILING_MAX_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window cannot exceed {settings.PROFILING_MAX_WINDOW} seconds",
+        )
+    if not window_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        sampler = StackSampler(interval).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await run_in_threadpool(sampler.stop)
+    finally:
+        window_lock.release()
+    return _folded_response(sampler.collapsed(), "profile.folded")
+
+
+@router.get("/profiles", response_model=ResponseModel[List[dict]])
+async def list_profiles(
+    current_user: Any = Depends(get_current_active_superuser),
+) -> Any:
+    """List the most recent request profiles held by this worker."""
+    profiles = [
+        {
+            "id": profile.id,
+            "method": profile.method,
+            "path": profile.path,
+            "duration": profile.duration,
+            "sample_count": profile.sample_count,
+            "created_at": profile.created_at.isoformat(),
+        }
+        for profile in profile_store.list()
+    ]
+    return ResponseModel(data=profiles)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def download_profile(
+    profile_id: str,
+    current_user: Any = Depends(get_current_active_superuser),
+) -> PlainTextResponse:
+    """Download a request profile in folded stack format."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _folded_response(profile.collapsed, f"{profile_id}.folded")
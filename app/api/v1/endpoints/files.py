@@ -0,0 +1,132 @@
+"""File upload endpoints."""
+
+from typing import Any, List, Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, Response
+
+from app.api.v1.endpoints.auth import get_current_active_user
+from app.core.config import settings
+from app.models.file import File
+from app.models.user import User
+from app.schemas.common import ResponseModel
+from app.services.file_service import FileService, FileTooLarge, blob_path
+
+router = APIRouter()
+
+
+async def get_readable_file(
+    file_id: str,
+    current_user: User = Depends(get_current_active_user),
+    file_service: FileService = Depends(),
+) -> File:
+    """The requested file, if the current user owns it or is a superuser."""
+    file = await file_service.get_by_id(file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    if file.owner_id != str(current_user.id) and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return file
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment header that survives non-ASCII filenames."""
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+@router.post(
+    "/",
+    response_model=ResponseModel[File],
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_file(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    content_length: Optional[int] = Header(None),
+    content_type: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user),
+    file_service: FileService = Depends(),
+) -> Any:
+    """Upload a file sent as the raw request body.
+
+    The body is streamed to disk as it arrives; multipart bodies are
+    refused since they would have to be parsed and spooled first.
+    """
+    if content_type and content_type.startswith("multipart/"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the file as the raw request body, not multipart",
+        )
+    if content_length is not None and content_length > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
+
+    try:
+        file = await file_service.upload(
+            str(current_user.id), filename, content_type, request.stream()
+        )
+    except FileTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
+    return ResponseModel(data=file, message="File uploaded successfully")
+
+
+@router.get("/", response_model=ResponseModel[List[File]])
+async def read_files(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+    file_service: FileService = Depends(),
+) -> Any:
+    """Retrieve the current user's files, newest first."""
+    files = await file_service.get_multi(str(current_user.id), skip=skip, limit=limit)
+    return ResponseModel(data=files)
+
+
+@router.get("/{file_id}", response_model=ResponseModel[File])
+async def read_file(file: File = Depends(get_readable_file)) -> Any:
+    """Get a file's metadata."""
+    return ResponseModel(data=file)
+
+
+@router.get("/{file_id}/content", response_class=FileResponse)
+async def download_file(file: File = Depends(get_readable_file)) -> Any:
+    """Download a file's content; ``Range`` requests are supported.
+
+    With ``UPLOAD_ACCEL_REDIRECT`` set, nginx serves the blob itself
+    (with sendfile) and the worker only sends headers.
+    """
+    headers = {
+        # Content never changes under a file id
+        "ETag": f'"{file.sha256}"',
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if settings.UPLOAD_ACCEL_REDIRECT:
+        location = settings.UPLOAD_ACCEL_REDIRECT.rstrip("/")
+        headers["X-Accel-Redirect"] = f"{location}/{file.sha256[:2]}/{file.sha256}"
+        headers["Content-Disposition"] = content_disposition(file.filename)
+        return Response(media_type=file.content_type, headers=headers)
+
+    return FileResponse(
+        blob_path(file.sha256),
+        media_type=file.content_type,
+        filename=file.filename,
+        headers=headers,
+    )
+
+
+@router.delete("/{file_id}", response_model=ResponseModel[None])
+async def delete_file(
+    file: File = Depends(get_readable_file),
+    file_service: FileService = Depends(),
+) -> Any:
+    """Delete a file."""
+    if not await file_service.delete(file):
+        raise HTTPException(status_code=404, detail="File not found")
+    return ResponseModel(message="File deleted successfully")
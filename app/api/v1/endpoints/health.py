@@ -3,7 +3,9 @@
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 
+from app.core import deadline
 from app.core.config import settings
+from app.db import mongodb
 from app.db.mongodb import get_database
 
 router = APIRouter()
@@ -37,6 +39,29 @@ async def detailed_health_check(db=Depends(get_database)) -> JSONResponse:
             "version": settings.VERSION,
             "environment": settings.ENVIRONMENT,
             "database": db_status,
+            "circuit": mongodb.breaker.state,
             "timestamp": "2024-01-01T00:00:00Z",  # You can use datetime.utcnow().isoformat()
         }
     )
+
+
+@router.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """Readiness check, failing while the database is unavailable."""
+    try:
+        # Goes through the circuit breaker: fails fast while it is open and
+        # serves as a probe while it is half-open
+        await deadline.run("health.ready", lambda: get_database().command("ping"))
+        db_status = "healthy"
+    except Exception as e:
+        db_status = f"unhealthy: {str(e)}"
+    
+    ready = db_status == "healthy"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "unavailable",
+            "database": db_status,
+            "circuit": mongodb.breaker.state,
+        },
+    )
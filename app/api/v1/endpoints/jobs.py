@@ -0,0 +1,36 @@
+"""Background job endpoints."""
+
+from typing import Any
+
+from celery.result import AsyncResult
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.endpoints.auth import get_current_active_superuser
+from app.core.celery import celery_app
+from app.schemas.common import JobStatus, ResponseModel
+
+router = APIRouter()
+
+
+def get_job_status(task_id: str) -> JobStatus:
+    """Read a job's state from the result backend (blocking)."""
+    result = AsyncResult(task_id, app=celery_app)
+    status = JobStatus(id=task_id, state=result.state)
+    if result.state == "PROGRESS":
+        status.progress = result.info
+    elif result.successful():
+        status.result = result.result
+    elif result.failed():
+        status.error = str(result.result)
+    return status
+
+
+@router.get("/{task_id}", response_model=ResponseModel[JobStatus])
+async def read_job(
+    task_id: str,
+    current_user: Any = Depends(get_current_active_superuser),
+) -> Any:
+    """Get the status of a background job (superuser only)."""
+    status = await run_in_threadpool(get_job_status, task_id)
+    return ResponseModel(data=status)
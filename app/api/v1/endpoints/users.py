@@ -1,13 +1,18 @@
 """User endpoints."""
 
-from typing import Any, List
+import os
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.models.user import User, UserCreate, UserUpdate
-from app.schemas.common import ResponseModel
-from app.services.user_service import UserService
+from app.models.user import User, UserBulkAction, UserCreate, UserUpdate
+from app.schemas.common import CursorPage, JobStatus, ResponseModel
+from app.services.email_service import send_verification_email
+from app.services.user_service import UserService, user_change_feed
 from app.api.v1.endpoints.auth import get_current_active_user, get_current_active_superuser
+from app.tasks.users import bulk_query, bulk_user_action, export_path, export_users
 
 router = APIRouter()
 
@@ -26,6 +31,7 @@ async def create_user(
         )
     
     user = await user_service.create(user_in)
+    send_verification_email(user)
     return ResponseModel(data=user, message="User created successfully")
 
 
@@ -48,6 +54,38 @@ async def update_user_me(
     return ResponseModel(data=user, message="User updated successfully")
 
 
+@router.get("/search", response_model=ResponseModel[CursorPage[User]])
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    field: Literal["name", "email"] = "name",
+    limit: int = Query(10, ge=1, le=20),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_superuser),
+    user_service: UserService = Depends(),
+) -> Any:
+    """Typeahead prefix search on full name or email (superuser only)."""
+    try:
+        users, next_cursor = await user_service.search(
+            q, field=field, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ResponseModel(data=CursorPage(items=users, next_cursor=next_cursor))
+
+
+@router.get("/changes", response_class=StreamingResponse)
+async def stream_user_changes(
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Stream user inserts, updates and deletes as Server-Sent Events."""
+    return StreamingResponse(
+        user_change_feed.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{user_id}", response_model=ResponseModel[User])
 async def read_user_by_id(
     user_id: str,
@@ -84,3 +122,62 @@ async def read_users(
     return ResponseModel(data=users)
 
 
+@router.post("/bulk", response_model=ResponseModel[Dict[str, Any]])
+async def bulk_action(
+    bulk_in: UserBulkAction,
+    response: Response,
+    current_user: User = Depends(get_current_active_superuser),
+    user_service: UserService = Depends(),
+) -> Any:
+    """Activate, deactivate or delete users matching a filter (superuser only).
+    
+    With ``dry_run`` only the number of matching users is returned. Otherwise
+    the action runs in the background; poll ``/jobs/{job_id}`` for progress.
+    The calling superuser is never affected.
+    """
+    filter_data = bulk_in.filter.model_dump(mode="json", exclude_none=True)
+    exclude_ids = [str(current_user.id)]
+    matched = await user_service.count(bulk_query(filter_data, exclude_ids))
+    if bulk_in.dry_run:
+        return ResponseModel(
+            data={"matched": matched},
+            message=f"{matched} users would be affected",
+        )
+    
+    result = await run_in_threadpool(
+        bulk_user_action.delay, filter_data, bulk_in.action, exclude_ids
+    )
+    response.status_code = status.HTTP_202_ACCEPTED
+    return ResponseModel(
+        data={"matched": matched, "job_id": result.id, "state": result.state},
+        message="Bulk action scheduled",
+    )
+
+
+@router.post(
+    "/export",
+    response_model=ResponseModel[JobStatus],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def start_export(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Export all users to CSV in the background (superuser only)."""
+    result = await run_in_threadpool(export_users.delay)
+    return ResponseModel(
+        data=JobStatus(id=result.id, state=result.state),
+        message="Export scheduled",
+    )
+
+
+@router.get("/export/{task_id}", response_class=FileResponse)
+async def download_export(
+    task_id: str,
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Download a finished user export (superuser only)."""
+    path = export_path(os.path.basename(task_id))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Export not found or not ready")
+    return FileResponse(path, media_type="text/csv", filename=os.path.basename(path))
+
@@ -0,0 +1,222 @@
+"""Adaptive concurrency limiting and load shedding.
+
+Each route class (auth, write, read) gets its own limiter. A limiter admits
+requests up to its current limit and queues a bounded number of extra
+requests for a short time; everything beyond that is rejected straight away
+with a 503 and ``Retry-After`` instead of piling up on the event loop, the
+Mongo pool and bcrypt until nginx gives up.
+
+Limits follow an AIMD scheme: every request that finishes under the target
+latency nudges the limit up (about +1 per limit's worth of requests), and a
+request that finishes over it cuts the limit by a fixed factor, at most once
+per target-latency interval.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "http_admission_queue_seconds",
+    "Time requests spent waiting for admission",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+ADMISSION_SHED_TOTAL = Counter(
+    "http_admission_shed_total",
+    "Requests rejected by admission control",
+    ["route_class"],
+)
+ADMISSION_LIMIT = Gauge(
+    "http_admission_limit",
+    "Current adaptive concurrency limit",
+    ["route_class"],
+    multiprocess_mode="liveall",  # limits adapt per worker
+)
+ADMISSION_INFLIGHT = Gauge(
+    "http_admission_inflight",
+    "Requests currently admitted",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with a bounded wait queue."""
+
+    backoff = 0.9
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        min_limit: int,
+        target_latency: float,
+        queue_size: int,
+        queue_timeout: float,
+    ):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.target_latency = target_latency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.limit = float(max_limit)
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        ADMISSION_LIMIT.labels(name).set(self.limit)
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; return False if the request should be shed."""
+        if self._has_capacity() and not self._waiters:
+            self._admit()
+            return True
+        if len(self._waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # A granted slot is already counted in ``inflight`` by _wake()
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been granted just as the timeout fired
+            return waiter.done() and not waiter.cancelled()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: Optional[float]) -> None:
+        """Free a slot and adapt the limit to the observed latency."""
+        self.inflight -= 1
+        ADMISSION_INFLIGHT.labels(self.name).dec()
+        if latency is not None:
+            self._adapt(latency)
+        self._wake()
+
+    def _admit(self) -> None:
+        self.inflight += 1
+        ADMISSION_INFLIGHT.labels(self.name).inc()
+
+    def _adapt(self, latency: float) -> None:
+        now = time.monotonic()
+        if latency > self.target_latency:
+            if now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                logger.info(
+                    "Admission limit decreased",
+                    route_class=self.name,
+                    limit=int(self.limit),
+                    latency=latency,
+                )
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
+
+
+def build_limiters() -> Dict[str, AdaptiveLimiter]:
+    """Create one limiter per route class from settings."""
+    classes = {
+        "auth": (settings.ADMISSION_AUTH_LIMIT, settings.ADMISSION_AUTH_TARGET_LATENCY),
+        "write": (settings.ADMISSION_WRITE_LIMIT, settings.ADMISSION_TARGET_LATENCY),
+        "read": (settings.ADMISSION_READ_LIMIT, settings.ADMISSION_TARGET_LATENCY),
+    }
+    return {
+        name: AdaptiveLimiter(
+            name,
+            max_limit,
+            min_limit=settings.ADMISSION_MIN_LIMIT,
+            target_latency=target_latency,
+            queue_size=settings.ADMISSION_QUEUE_SIZE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        )
+        for name, (max_limit, target_latency) in classes.items()
+    }
+
+
+def classify(scope: Scope) -> Optional[str]:
+    """Return the route class of a request, or None if it is never shed."""
+    path = scope["path"]
+    for exempt in settings.admission_exempt_paths:
+        if path == exempt or path.startswith(exempt.rstrip("/") + "/"):
+            return None
+    if path.startswith(f"{settings.API_V1_STR}/auth"):
+        return "auth"
+    if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+class AdmissionControlMiddleware:
+    """Admit, queue or shed requests per route class."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.limiters = build_limiters()
+        self.shed_body = json.dumps(
+            {"success": False, "message": "Server is overloaded, retry later"}
+        ).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = classify(scope) if scope["type"] == "http" else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[route_class]
+        arrived = time.perf_counter()
+        admitted = await limiter.acquire()
+        started = time.perf_counter()
+        ADMISSION_QUEUE_SECONDS.labels(route_class).observe(started - arrived)
+        if not admitted:
+            ADMISSION_SHED_TOTAL.labels(route_class).inc()
+            await self._shed(send)
+            return
+
+        latency: Optional[float] = None
+        try:
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - started
+        finally:
+            limiter.release(latency)
+
+    async def _shed(self, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self.shed_body)).encode()),
+                    (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": self.shed_body})
@@ -0,0 +1,108 @@
+"""Celery application and async task helpers."""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, TypeVar
+
+from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_process_shutdown
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db import mongodb
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+celery_app = Celery(
+    "marslanding",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.tasks.users", "app.tasks.maintenance"],
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    timezone="UTC",
+    enable_utc=True,
+    task_track_started=True,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=True,
+    task_store_eager_result=settings.CELERY_TASK_ALWAYS_EAGER,
+)
+
+celery_app.conf.beat_schedule = {
+    "cleanup-exports": {
+        "task": "app.tasks.maintenance.cleanup_exports",
+        "schedule": crontab(minute=0),
+    },
+    "cleanup-partial-uploads": {
+        "task": "app.tasks.maintenance.cleanup_partial_uploads",
+        "schedule": crontab(minute=15),
+    },
+    "archive-inactive-users": {
+        "task": "app.tasks.users.archive_inactive_users",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
+
+
+def task(name: str, *, bind: bool = False) -> Callable[[Callable[..., T]], Any]:
+    """``celery_app.task`` with a signature the type checker can follow.
+
+    The returned task object (``.delay`` and the rest) is left untyped, as
+    Celery ships no type information.
+    """
+    decorator: Callable[[Callable[..., T]], Any] = celery_app.task(
+        name=name, bind=bind
+    )
+    return decorator
+
+
+# Motor clients bind to the event loop that first uses them, so each thread
+# running tasks keeps one loop alive for its whole lifetime.
+_local = threading.local()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    return loop
+
+
+def run_async(func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    """Run async application code (e.g. ``UserService``) from a task.
+
+    Must not be called from a thread with a running event loop; API code
+    enqueues tasks instead of calling them directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("run_async() cannot be called from a running event loop")
+
+    loop = _get_loop()
+    if mongodb.database is None:
+        loop.run_until_complete(mongodb.connect_to_mongo())
+    return loop.run_until_complete(func(*args, **kwargs))
+
+
+def _close_worker_resources(**kwargs: Any) -> None:
+    loop = getattr(_local, "loop", None)
+    if loop is not None and not loop.is_closed():
+        loop.run_until_complete(mongodb.close_mongo_connection())
+        loop.close()
+
+
+worker_process_shutdown.connect(_close_worker_resources)
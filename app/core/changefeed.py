@@ -0,0 +1,281 @@
+"""Shared MongoDB change-stream fan-out for Server-Sent Events.
+
+Each worker process runs at most one change-stream watcher per feed, no
+matter how many clients are connected. The watcher fans every change out
+to per-client queues. The queues are bounded, and a client that falls a
+full queue behind is dropped instead of holding up the watcher or growing
+memory without bound.
+
+Event ids are change-stream resume tokens. Recent events are kept so a
+client reconnecting with ``Last-Event-ID`` is sent what it missed. If its
+token has aged out it gets a ``reset`` event and must refetch. The watcher
+itself resumes from its last token after a network error, and stops once
+it has had no clients for ``CHANGE_FEED_IDLE_TIMEOUT``.
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+)
+
+from prometheus_client import Counter, Gauge
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.mongodb import get_collection
+
+logger = get_logger(__name__)
+
+CHANGE_FEED_SUBSCRIBERS = Gauge(
+    "change_feed_subscribers",
+    "Clients currently subscribed to a change feed",
+    ["feed"],
+    multiprocess_mode="livesum",
+)
+CHANGE_FEED_EVENTS_TOTAL = Counter(
+    "change_feed_events_total",
+    "Change events read from MongoDB",
+    ["feed", "operation"],
+)
+CHANGE_FEED_DROPPED_TOTAL = Counter(
+    "change_feed_dropped_total",
+    "Clients dropped for falling behind",
+    ["feed"],
+)
+
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost:
+# the stored resume token cannot be used any more
+RESUME_FAILED_CODES = {260, 280, 286}
+# $changeStream is only supported on replica sets and sharded clusters
+NOT_SUPPORTED_CODE = 40573
+
+RETRY = b"retry: 5000\n\n"  # ms browsers wait before reconnecting
+RESET = b"event: reset\ndata: {}\n\n"
+DROPPED = b"event: dropped\ndata: {}\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+@dataclass
+class ChangeEvent:
+    """A change ready to be sent to clients."""
+
+    id: str
+    operation: str
+    data: Dict[str, Any]
+
+    def encode(self) -> bytes:
+        """Render the event in SSE wire format."""
+        return (
+            f"id: {self.id}\nevent: {self.operation}\n"
+            f"data: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+        ).encode()
+
+
+class Subscription:
+    """One client's view of a feed."""
+
+    def __init__(self, queue_size: int):
+        # None marks the end of the stream (dropped or feed closed)
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(queue_size)
+        self.backlog: List[bytes] = []
+
+    def offer(self, message: bytes) -> bool:
+        """Queue a message; return False if the client is too far behind."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def end(self) -> None:
+        """Discard anything queued and end the client's stream."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChangeFeed:
+    """Fan a collection's change stream out to many subscribers."""
+
+    def __init__(
+        self,
+        collection_name: str,
+        transform: Callable[[Mapping[str, Any]], Dict[str, Any]],
+        pipeline: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.name = collection_name
+        self.transform = transform
+        self.pipeline = pipeline or []
+        self.queue_size = settings.CHANGE_FEED_QUEUE_SIZE
+        self.replay_size = settings.CHANGE_FEED_REPLAY_SIZE
+        self.idle_timeout = settings.CHANGE_FEED_IDLE_TIMEOUT
+        self.retry_delay = 1.0
+        self._subscribers: Set[Subscription] = set()
+        self._recent: "OrderedDict[str, bytes]" = OrderedDict()
+        self._resume_token: Optional[Mapping[str, Any]] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._idle_since = time.monotonic()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Register a client, with a backlog of missed events if it resumes."""
+        if self._watcher is None or self._watcher.done():
+            self._start()
+        subscription = Subscription(self.queue_size)
+        if last_event_id:
+            if last_event_id in self._recent:
+                ids = list(self._recent)
+                subscription.backlog = [
+                    self._recent[event_id]
+                    for event_id in ids[ids.index(last_event_id) + 1 :]
+                ]
+            else:
+                subscription.backlog = [RESET]
+        self._subscribers.add(subscription)
+        CHANGE_FEED_SUBSCRIBERS.labels(self.name).set(len(self._subscribers))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a client; the watcher lingers for ``idle_timeout``."""
+        self._subscribers.discard(subscription)
+        CHANGE_FEED_SUBSCRIBERS.labels(self.name).set(len(self._subscribers))
+        if not self._subscribers:
+            self._idle_since = time.monotonic()
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Yield SSE messages for one client until it leaves or is dropped."""
+        subscription = self.subscribe(last_event_id)
+        try:
+            yield RETRY
+            for queued in subscription.backlog:
+                yield queued
+            subscription.backlog = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(), settings.CHANGE_FEED_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+                    continue
+                if message is None:
+                    yield DROPPED
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    async def close(self) -> None:
+        """Stop the watcher and end every client's stream."""
+        for subscription in list(self._subscribers):
+            subscription.end()
+        self._subscribers.clear()
+        CHANGE_FEED_SUBSCRIBERS.labels(self.name).set(0)
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watcher = None
+
+    def publish(self, change: Mapping[str, Any]) -> None:
+        """Record a raw change event and fan it out to every subscriber."""
+        operation = change["operationType"]
+        CHANGE_FEED_EVENTS_TOTAL.labels(self.name, operation).inc()
+        event = ChangeEvent(
+            id=change["_id"]["_data"],
+            operation=operation,
+            data=self.transform(change),
+        )
+        message = event.encode()
+        self._recent[event.id] = message
+        while len(self._recent) > self.replay_size:
+            self._recent.popitem(last=False)
+        for subscription in list(self._subscribers):
+            if not subscription.offer(message):
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        CHANGE_FEED_DROPPED_TOTAL.labels(self.name).inc()
+        logger.info("Dropping slow change feed client", feed=self.name)
+        self._subscribers.discard(subscription)
+        CHANGE_FEED_SUBSCRIBERS.labels(self.name).set(len(self._subscribers))
+        subscription.end()
+
+    def _reset(self) -> None:
+        """Forget history that can no longer be resumed and tell clients."""
+        self._resume_token = None
+        self._recent.clear()
+        for subscription in list(self._subscribers):
+            if not subscription.offer(RESET):
+                self._drop(subscription)
+
+    def _start(self) -> None:
+        # A fresh watcher starts from "now", so older history is meaningless
+        self._resume_token = None
+        self._recent.clear()
+        # Run outside the subscribing request's context (and its deadline)
+        self._watcher = asyncio.get_running_loop().create_task(
+            self._watch(), context=contextvars.Context()
+        )
+        self._tasks.add(self._watcher)
+        self._watcher.add_done_callback(self._tasks.discard)
+
+    def _idle(self) -> bool:
+        return (
+            not self._subscribers
+            and time.monotonic() - self._idle_since >= self.idle_timeout
+        )
+
+    async def _watch(self) -> None:
+        collection = get_collection(self.name)
+        logger.info("Change feed watcher started", feed=self.name)
+        while True:
+            try:
+                async with collection.watch(
+                    self.pipeline,
+                    resume_after=self._resume_token,
+                    max_await_time_ms=1000,
+                ) as change_stream:
+                    while change_stream.alive:
+                        change = await change_stream.try_next()
+                        if change is not None:
+                            self._resume_token = change_stream.resume_token
+                            self.publish(change)
+                        elif self._idle():
+                            # Let the next subscriber start a new watcher
+                            # while this one closes its cursor
+                            self._watcher = None
+                            logger.info("Change feed watcher idle", feed=self.name)
+                            return
+            except OperationFailure as e:
+                if e.code == NOT_SUPPORTED_CODE:
+                    logger.error("Change streams need a replica set", feed=self.name)
+                    self._watcher = None
+                    for subscription in list(self._subscribers):
+                        self._drop(subscription)
+                    return
+                if e.code in RESUME_FAILED_CODES:
+                    logger.warning(
+                        "Change feed history lost, resetting clients",
+                        feed=self.name,
+                        error=str(e),
+                    )
+                    self._reset()
+                    continue
+                logger.warning("Change feed error", feed=self.name, error=str(e))
+            except PyMongoError as e:
+                logger.warning("Change feed error", feed=self.name, error=str(e))
+            await asyncio.sleep(self.retry_delay)
@@ -45,6 +45,20 @@ class Settings(BaseSettings):
     MONGODB_DATABASE: str = "marslanding"
     MONGODB_MAX_CONNECTIONS: int = 10
     MONGODB_MIN_CONNECTIONS: int = 1
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 2000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 2000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 20000  # backstop for calls without a deadline
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 2000  # pool checkout
+
+    # MongoDB circuit breaker
+    MONGODB_BREAKER_ENABLED: bool = True
+    MONGODB_BREAKER_WINDOW: float = 10.0  # seconds of calls considered
+    MONGODB_BREAKER_MIN_CALLS: int = 20  # calls in the window before it can trip
+    MONGODB_BREAKER_FAILURE_RATE: float = 0.5
+    MONGODB_BREAKER_SLOW_CALL: float = 1.0  # seconds
+    MONGODB_BREAKER_SLOW_RATE: float = 0.8
+    MONGODB_BREAKER_OPEN_SECONDS: float = 5.0
+    MONGODB_BREAKER_PROBES: int = 3  # successful half-open calls needed to close
     
     # Redis settings
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -53,6 +67,10 @@ class Settings(BaseSettings):
     # Celery settings
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    CELERY_TASK_ALWAYS_EAGER: bool = False  # run tasks inline, for tests
+    CELERY_RESULT_EXPIRES: int = 60 * 60 * 24  # 1 day
+    EXPORT_RETENTION_HOURS: int = 24
+    BULK_CHUNK_SIZE: int = 1000  # users changed per round trip
     
     # Email settings
     SMTP_TLS: bool = True
@@ -62,20 +80,116 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: Optional[str] = None
     EMAILS_FROM_EMAIL: Optional[EmailStr] = None
     EMAILS_FROM_NAME: Optional[str] = "Mars Landing"
+    FRONTEND_URL: str = "http://localhost:3000"  # base of links sent by email
+    EMAIL_VERIFY_TOKEN_EXPIRE_HOURS: int = 48
+    EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 1
+
+    # Outbound mail delivery (in-process queue and SMTP connection pool)
+    MAIL_POOL_SIZE: int = 2  # SMTP connections, one per sender task
+    MAIL_QUEUE_SIZE: int = 1000  # further messages are dropped
+    MAIL_BATCH_SIZE: int = 20  # queued messages sent per connection turn
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_BACKOFF: float = 1.0  # seconds, doubled per retry
+    MAIL_TIMEOUT: float = 10.0  # seconds, SMTP socket timeout
+    MAIL_IDLE_TIMEOUT: float = 60.0  # seconds before an idle connection is closed
+    MAIL_DRAIN_TIMEOUT: float = 10.0  # seconds to flush the queue on shutdown
     
     # Monitoring settings
     ENABLE_METRICS: bool = True
+    METRICS_CACHE_SECONDS: float = 2.0  # rendered scrape output is reused this long
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: Optional[int] = None  # serve metrics here instead of /metrics
     SENTRY_DSN: Optional[HttpUrl] = None
-    
+
+    # Profiling settings (off by default; nothing is installed unless enabled)
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL: float = 0.005  # seconds between stack samples
+    PROFILING_MAX_CONCURRENT: int = 4
+    PROFILING_MAX_STORED: int = 50
+    PROFILING_MAX_WINDOW: int = 25  # seconds, stays below nginx proxy_read_timeout
+
     # File upload settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_ACCEL_REDIRECT: Optional[str] = None  # nginx internal location for blobs
+    UPLOAD_TEMP_RETENTION_HOURS: int = 1  # abandoned partial uploads
     
     # Rate limiting
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60  # seconds
-    
+
+    # Request deadlines (kept below nginx's 30s proxy_read_timeout)
+    REQUEST_TIMEOUT: float = 25.0  # seconds, 0 disables the deadline
+    REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout"
+    REQUEST_TIMEOUT_OVERRIDES: str = ""  # "path_prefix=seconds,..."
+
+    @property
+    def request_timeout_overrides(self) -> Dict[str, float]:
+        """Get per-route request timeouts keyed by path prefix."""
+        overrides = {}
+        for item in self.REQUEST_TIMEOUT_OVERRIDES.split(","):
+            if "=" in item:
+                prefix, seconds = item.split("=", 1)
+                overrides[prefix.strip()] = float(seconds)
+        return overrides
+
+    # Admission control (adaptive per-route-class concurrency limits)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_AUTH_LIMIT: int = 8
+    ADMISSION_WRITE_LIMIT: int = 32
+    ADMISSION_READ_LIMIT: int = 128
+    ADMISSION_MIN_LIMIT: int = 2
+    ADMISSION_TARGET_LATENCY: float = 0.25  # seconds
+    ADMISSION_AUTH_TARGET_LATENCY: float = 1.0  # seconds, bcrypt is slow
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0  # seconds
+    ADMISSION_RETRY_AFTER: int = 1  # seconds
+    ADMISSION_EXEMPT_PATHS: str = (
+        "/health,/metrics,/api/v1/health,/api/v1/users/changes"
+    )
+
+    @property
+    def admission_exempt_paths(self) -> List[str]:
+        """Get paths that bypass admission control as a list."""
+        return [path.strip() for path in self.ADMISSION_EXEMPT_PATHS.split(",")]
+
+    # Idempotency keys for POST/PATCH requests
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_HEADER: str = "Idempotency-Key"
+    IDEMPOTENCY_TTL: int = 60 * 60 * 24  # seconds a stored response is replayed
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 60.0  # seconds before a stuck claim is taken over
+    IDEMPOTENCY_MAX_BODY: int = 1024 * 1024  # larger requests/responses aren't stored
+    IDEMPOTENCY_EXEMPT_PATHS: str = "/api/v1/auth"
+
+    @property
+    def idempotency_exempt_paths(self) -> List[str]:
+        """Get paths that never honour idempotency keys as a list."""
+        return [path.strip() for path in self.IDEMPOTENCY_EXEMPT_PATHS.split(",")]
+
+    # Change feeds (Server-Sent Events from MongoDB change streams)
+    CHANGE_FEED_QUEUE_SIZE: int = 256  # events per client before it is dropped
+    CHANGE_FEED_REPLAY_SIZE: int = 1000  # recent events kept for reconnects
+    CHANGE_FEED_HEARTBEAT: float = 15.0  # seconds, below nginx proxy_read_timeout
+    CHANGE_FEED_IDLE_TIMEOUT: float = 60.0  # seconds a watcher outlives its clients
+
+    # Archival of long-inactive users to the users_archive collection
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_INACTIVE_DAYS: int = 365  # no login or update for this long
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_BATCH_PAUSE: float = 0.5  # seconds between batches, spares the primary
+    LAST_LOGIN_RESOLUTION: int = 60 * 60  # seconds between last_login_at writes
+    COLLECTION_STATS_INTERVAL: float = 60.0  # seconds between size gauge updates
+
+    # Online data migrations (python -m app.db.migrations)
+    MIGRATION_BATCH_SIZE: int = 500
+    MIGRATION_BATCH_PAUSE: float = 0.1  # minimum seconds between batches
+    MIGRATION_DUTY_CYCLE: float = 0.5  # largest share of time spent on batches
+    MIGRATION_LOCK_TIMEOUT: float = 300.0  # seconds before a silent runner is replaced
+
     # Cache settings
     CACHE_TTL: int = 300  # 5 minutes
     CACHE_ENABLED: bool = True
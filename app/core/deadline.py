@@ -0,0 +1,207 @@
+"""Per-request deadlines.
+
+``DeadlineMiddleware`` stores an absolute deadline for every request in a
+context variable. Database calls made through :func:`run` pick it up
+automatically: the remaining time is applied with ``pymongo.timeout()``,
+which sends it to the server as ``maxTimeMS`` and also bounds connection
+checkout and socket I/O. The same budget is enforced on the client with
+``asyncio.wait_for``. Calls also go through the MongoDB circuit breaker
+(see ``app.db.mongodb``).
+
+The middleware also cancels the request when the client disconnects, so
+abandoned requests stop holding pooled connections.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import pymongo
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db import mongodb
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+DEADLINE_EXCEEDED_TOTAL = Counter(
+    "request_deadline_exceeded_total",
+    "Operations aborted because the request deadline expired",
+    ["operation"],
+)
+CLIENT_DISCONNECT_CANCELLED_TOTAL = Counter(
+    "request_client_disconnect_cancelled_total",
+    "Requests cancelled because the client disconnected",
+)
+
+# Absolute deadline on the time.monotonic() clock, None when unbounded
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request's deadline has expired."""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if unbounded."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _expired(operation: str) -> DeadlineExceeded:
+    DEADLINE_EXCEEDED_TOTAL.labels(operation).inc()
+    return DeadlineExceeded(f"Deadline exceeded during {operation}")
+
+
+async def run(operation: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run a database call under the current request deadline.
+
+    ``call`` must start the operation when invoked (not before), because
+    Motor submits the work to its executor at call time and captures the
+    ``pymongo.timeout()`` context there.
+    """
+    timeout = remaining()
+    if timeout is not None and timeout <= 0:
+        raise _expired(operation)
+    if settings.MONGODB_BREAKER_ENABLED:
+        return await mongodb.breaker.call(
+            operation, lambda: _run_bounded(operation, call, timeout)
+        )
+    return await _run_bounded(operation, call, timeout)
+
+
+async def _run_bounded(
+    operation: str, call: Callable[[], Awaitable[T]], timeout: Optional[float]
+) -> T:
+    if timeout is None:
+        return await call()
+    try:
+        with pymongo.timeout(timeout):
+            return await asyncio.wait_for(call(), timeout)
+    except asyncio.TimeoutError:
+        raise _expired(operation) from None
+    except ServerSelectionTimeoutError:
+        raise  # no usable server: a database outage, not a slow request
+    except PyMongoError as e:
+        if e.timeout:
+            raise _expired(operation) from e
+        raise
+
+
+async def deadline_exceeded_handler(request: Request, exc: Exception) -> JSONResponse:
+    """Turn an expired deadline into a 504 response."""
+    return JSONResponse(
+        status_code=504,
+        content={"success": False, "message": "Request deadline exceeded"},
+    )
+
+
+class DeadlineMiddleware:
+    """Set the request deadline and cancel requests on client disconnect."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.REQUEST_TIMEOUT_HEADER.lower().encode("latin-1")
+        # Longest prefix first so the most specific route wins
+        self.overrides = sorted(
+            settings.request_timeout_overrides.items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    def timeout_for(self, scope: Scope) -> Optional[float]:
+        """Route timeout, optionally lowered (never raised) by the header."""
+        timeout = settings.REQUEST_TIMEOUT
+        for prefix, seconds in self.overrides:
+            if scope["path"].startswith(prefix):
+                timeout = seconds
+                break
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0 and (not timeout or requested < timeout):
+                    timeout = requested
+                break
+        return timeout or None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self.timeout_for(scope)
+        token = request_deadline.set(
+            time.monotonic() + timeout if timeout is not None else None
+        )
+        try:
+            await self._run_cancellable(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+
+    async def _run_cancellable(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        # A single reader owns ``receive`` so a disconnect is noticed even
+        # when the handler never reads the body. The queue holds one
+        # message, so uploads keep their backpressure.
+        messages: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=1)
+        disconnected = False
+        response_complete = False
+
+        async def wrapped_receive() -> Message:
+            if disconnected and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def wrapped_send(message: Message) -> None:
+            nonlocal response_complete
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_complete = True
+
+        handler = asyncio.ensure_future(self.app(scope, wrapped_receive, wrapped_send))
+
+        async def watch_disconnect() -> None:
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                if message["type"] != "http.disconnect":
+                    await messages.put(message)
+                else:
+                    disconnected = True
+                    if messages.empty():
+                        messages.put_nowait(message)
+                    if not response_complete and not handler.done():
+                        CLIENT_DISCONNECT_CANCELLED_TOTAL.inc()
+                        logger.info(
+                            "Client disconnected, cancelling request",
+                            path=scope["path"],
+                        )
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+        finally:
+            watcher.cancel()
@@ -0,0 +1,341 @@
+"""Idempotency keys for non-idempotent writes.
+
+A ``POST`` or ``PATCH`` carrying an ``Idempotency-Key`` header runs at most
+once per principal and key. The first request claims the key in the
+``idempotency_keys`` collection and its response is stored there; a TTL
+index expires records after ``IDEMPOTENCY_TTL``. A retry with the same key:
+
+* gets the stored response back (with ``Idempotent-Replayed: true``), without
+  the request reaching any route handler;
+* waits for the first request to finish if it is still running;
+* is rejected with 422 if its method, path or body differ from the first.
+
+Without credentials the key is also scoped to the request itself, so
+unrelated anonymous callers picking the same key never meet; a different
+request with the key simply runs. The client address is not part of it:
+behind a proxy it is the proxy's, shared by every caller.
+
+Responses with a 5xx status (and 409/429) are not stored, and neither are
+failed or cancelled requests, so those can be retried for real.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from pymongo.errors import DuplicateKeyError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.logging import get_logger
+from app.core.security import verify_token
+from app.db.mongodb import DatabaseUnavailable, get_collection
+
+logger = get_logger(__name__)
+
+IDEMPOTENCY_REQUESTS_TOTAL = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an idempotency key, by outcome",
+    ["outcome"],
+)
+
+METHODS = ("POST", "PATCH")
+MAX_KEY_LENGTH = 255
+ANONYMOUS = "anonymous"
+# Statuses worth repeating for real on retry rather than replaying
+UNSTORED_STATUSES = {409, 429}
+POLL_INTERVAL = 0.05  # seconds, doubled up to MAX_POLL_INTERVAL
+MAX_POLL_INTERVAL = 0.5
+
+
+def fingerprint(scope: Scope, body: bytes) -> str:
+    """Hash identifying the request a key was first used for."""
+    digest = hashlib.sha256()
+    for part in (scope["method"], scope["path"], scope["query_string"].decode()):
+        digest.update(part.encode() + b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class BodyTooLarge(Exception):
+    """Raised when a keyed request body exceeds ``IDEMPOTENCY_MAX_BODY``."""
+
+    def __init__(self, messages: List[Message]):
+        super().__init__()
+        # Messages received so far, to hand on to the application
+        self.messages = messages
+
+
+def prepend(messages: List[Message], receive: Receive) -> Receive:
+    """``receive`` that first returns ``messages``."""
+    pending = list(messages)
+
+    async def receive_rest() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return receive_rest
+
+
+class IdempotencyMiddleware:
+    """Run keyed writes once and replay their stored response."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.IDEMPOTENCY_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(self.header)
+        if key is None or self._exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        principal = self._principal(headers)
+        if principal is None or not self._bufferable(headers):
+            # Invalid credentials fail anyway; huge uploads are not buffered
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._error(send, 400, "Invalid idempotency key")
+            return
+
+        try:
+            body = await self._read_body(receive)
+        except BodyTooLarge as e:
+            # Chunked uploads too large to buffer run without a key, as
+            # those with a large Content-Length do
+            await self.app(scope, prepend(e.messages, receive), send)
+            return
+        if body is None:
+            return  # client went away
+        request_hash = fingerprint(scope, body)
+        if principal == ANONYMOUS:
+            # Anonymous callers only share a key with retries of the very
+            # same request
+            principal = f"{ANONYMOUS}:{request_hash}"
+        record_id = f"{principal}:{key.decode('latin-1')}"
+
+        try:
+            record = await self._claim_or_wait(record_id, request_hash)
+        except DeadlineExceeded:
+            await self._error(send, 504, "Request deadline exceeded")
+            return
+        except DatabaseUnavailable:
+            await self._error(send, 503, "Dependency unavailable: database")
+            return
+        if record is not None:
+            if record["fingerprint"] != request_hash:
+                IDEMPOTENCY_REQUESTS_TOTAL.labels("mismatch").inc()
+                await self._error(
+                    send, 422, "Idempotency key was used for a different request"
+                )
+                return
+            IDEMPOTENCY_REQUESTS_TOTAL.labels("replayed").inc()
+            await self._replay(send, record)
+            return
+
+        IDEMPOTENCY_REQUESTS_TOTAL.labels("executed").inc()
+        await self._execute(scope, body, receive, send, record_id)
+
+    def _exempt(self, path: str) -> bool:
+        return any(
+            path == exempt or path.startswith(exempt.rstrip("/") + "/")
+            for exempt in settings.idempotency_exempt_paths
+        )
+
+    def _principal(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        """User id from the bearer token, ``ANONYMOUS`` without one."""
+        authorization = headers.get(b"authorization")
+        if authorization is None:
+            return ANONYMOUS
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+        return verify_token(token.strip())
+
+    def _bufferable(self, headers: Dict[bytes, bytes]) -> bool:
+        """Whether the declared body size allows buffering the request."""
+        length = headers.get(b"content-length")
+        if length is None:
+            return True
+        try:
+            return int(length) <= settings.IDEMPOTENCY_MAX_BODY
+        except ValueError:
+            # Malformed; left to the server and application to reject
+            return False
+
+    async def _read_body(self, receive: Receive) -> Optional[bytes]:
+        messages: List[Message] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            messages.append(message)
+            size += len(message.get("body", b""))
+            if size > settings.IDEMPOTENCY_MAX_BODY:
+                raise BodyTooLarge(messages)
+            if not message.get("more_body", False):
+                return b"".join(message.get("body", b"") for message in messages)
+
+    async def _claim_or_wait(
+        self, record_id: str, request_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        """Claim the key (returning None) or return the record holding it.
+
+        While another request holds the key, wait for it to finish. A claim
+        older than ``IDEMPOTENCY_LOCK_TIMEOUT`` belongs to a request that
+        died without releasing it, and is taken over.
+        """
+        collection = get_collection("idempotency_keys")
+        interval = POLL_INTERVAL
+        while True:
+            now = datetime.utcnow()
+            try:
+                await deadline.run(
+                    "idempotency.claim",
+                    lambda: collection.insert_one(
+                        {
+                            "_id": record_id,
+                            "fingerprint": request_hash,
+                            "state": "in_progress",
+                            "created_at": now,
+                        }
+                    ),
+                )
+                return None
+            except DuplicateKeyError:
+                pass
+
+            record: Optional[Dict[str, Any]] = await deadline.run(
+                "idempotency.get", lambda: collection.find_one({"_id": record_id})
+            )
+            if record is None:
+                continue  # released by a failed first request
+            if record["state"] == "completed" or record["fingerprint"] != request_hash:
+                return record
+
+            lock_timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+            if record["created_at"] < now - lock_timeout:
+                logger.warning("Taking over stale idempotency key", key=record_id)
+                await deadline.run(
+                    "idempotency.takeover",
+                    lambda: collection.delete_one(
+                        {
+                            "_id": record_id,
+                            "state": "in_progress",
+                            "created_at": record["created_at"],
+                        }
+                    ),
+                )
+                continue
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    async def _execute(
+        self, scope: Scope, body: bytes, receive: Receive, send: Send, record_id: str
+    ) -> None:
+        """Run the request and store its response under the key."""
+        collection = get_collection("idempotency_keys")
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        size = 0
+        storable = True
+        # The buffered body, then whatever the client sends next (such as
+        # its disconnect, which streaming responses watch for)
+        replay_receive = prepend(
+            [{"type": "http.request", "body": body, "more_body": False}], receive
+        )
+
+        async def capture_send(message: Message) -> None:
+            nonlocal start, size, storable
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and storable:
+                chunk = message.get("body", b"")
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > settings.IDEMPOTENCY_MAX_BODY:
+                    storable = False
+                    chunks.clear()
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self._release(collection, record_id)
+            raise
+
+        status = start["status"] if start else 500
+        if not storable or status >= 500 or status in UNSTORED_STATUSES:
+            await self._release(collection, record_id)
+            return
+        headers = [
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in (start or {}).get("headers", [])
+        ]
+        try:
+            await deadline.run(
+                "idempotency.store",
+                lambda: collection.update_one(
+                    {"_id": record_id},
+                    {
+                        "$set": {
+                            "state": "completed",
+                            "status": status,
+                            "headers": headers,
+                            "body": b"".join(chunks),
+                        }
+                    },
+                ),
+            )
+        except Exception as e:
+            # The response is already sent; a retry will simply run again
+            logger.warning("Error storing idempotent response", error=str(e))
+            await self._release(collection, record_id)
+
+    async def _release(self, collection: Any, record_id: str) -> None:
+        try:
+            await collection.delete_one({"_id": record_id, "state": "in_progress"})
+        except Exception as e:
+            # The claim expires after IDEMPOTENCY_LOCK_TIMEOUT anyway
+            logger.warning("Error releasing idempotency key", error=str(e))
+
+    async def _replay(self, send: Send, record: Dict[str, Any]) -> None:
+        headers: List[Tuple[bytes, bytes]] = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in record["headers"]
+        ]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": record["status"],
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": bytes(record["body"])})
+
+    async def _error(self, send: Send, status: int, message: str) -> None:
+        body = json.dumps({"success": False, "message": message}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,291 @@
+"""Outbound email delivery.
+
+Requests never talk to SMTP themselves: :meth:`Mailer.send` renders the
+message and puts it on a bounded in-process queue, and ``MAIL_POOL_SIZE``
+background senders deliver it. Each sender keeps its own SMTP connection
+open between messages (closing it after ``MAIL_IDLE_TIMEOUT`` without
+work) and sends everything that has queued up, up to ``MAIL_BATCH_SIZE``
+messages, in one trip to the threadpool.
+
+Temporary failures (4xx replies, dropped connections) are retried with
+exponential backoff; permanent ones (5xx replies) are logged and dropped.
+When the queue is full, new messages are dropped rather than queued
+without bound. Without ``SMTP_HOST`` messages are only logged.
+
+Templates are ``app/templates/email/<name>.txt`` and ``<name>.html`` pairs,
+the text one starting with a ``Subject:`` line. Each is parsed once.
+"""
+
+import asyncio
+import html
+import smtplib
+import ssl
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Any, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+MAIL_MESSAGES_TOTAL = Counter(
+    "mail_messages_total",
+    "Outbound emails by outcome (sent, failed, dropped)",
+    ["template", "outcome"],
+)
+MAIL_RETRIES_TOTAL = Counter(
+    "mail_retries_total", "Emails retried after a temporary failure"
+)
+MAIL_QUEUE_DEPTH = Gauge(
+    "mail_queue_depth", "Emails waiting to be sent", multiprocess_mode="livesum"
+)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+
+@dataclass(frozen=True)
+class EmailTemplate:
+    """A parsed email template."""
+
+    subject: Template
+    text: Template
+    html: Template
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> EmailTemplate:
+    """Read and parse a template pair (once per process)."""
+    subject_line, _, text = (TEMPLATE_DIR / f"{name}.txt").read_text().partition("\n")
+    if not subject_line.startswith("Subject:"):
+        raise ValueError(f"Email template {name}.txt must start with 'Subject:'")
+    return EmailTemplate(
+        subject=Template(subject_line[len("Subject:") :].strip()),
+        text=Template(text.lstrip("\n")),
+        html=Template((TEMPLATE_DIR / f"{name}.html").read_text()),
+    )
+
+
+def render(name: str, to: str, context: dict) -> EmailMessage:
+    """Build the message for template ``name`` addressed to ``to``."""
+    template = load_template(name)
+    message = EmailMessage()
+    message["Subject"] = template.subject.substitute(context)
+    message["From"] = formataddr(
+        (settings.EMAILS_FROM_NAME or "", str(settings.EMAILS_FROM_EMAIL))
+    )
+    message["To"] = to
+    message.set_content(template.text.substitute(context))
+    message.add_alternative(
+        template.html.substitute(
+            {key: html.escape(str(value)) for key, value in context.items()}
+        ),
+        subtype="html",
+    )
+    return message
+
+
+@dataclass
+class Outgoing:
+    """A queued message."""
+
+    template: str
+    message: EmailMessage
+
+
+def is_temporary(error: Exception) -> bool:
+    """Whether sending again later might succeed."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+
+def _connect() -> smtplib.SMTP:
+    host = settings.SMTP_HOST
+    if not host:
+        raise smtplib.SMTPException("SMTP_HOST is not set")
+    port = settings.SMTP_PORT or (587 if settings.SMTP_TLS else 25)
+    if port == 465:
+        connection: smtplib.SMTP = smtplib.SMTP_SSL(
+            host, port, timeout=settings.MAIL_TIMEOUT
+        )
+    else:
+        connection = smtplib.SMTP(host, port, timeout=settings.MAIL_TIMEOUT)
+        if settings.SMTP_TLS:
+            connection.starttls(context=ssl.create_default_context())
+    if settings.SMTP_USER:
+        connection.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+    return connection
+
+
+def _close(connection: smtplib.SMTP) -> None:
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+# Refusals of one message; the connection stays usable for the next
+MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+def _deliver(
+    connection: Optional[smtplib.SMTP], batch: List[Outgoing]
+) -> Tuple[Optional[smtplib.SMTP], List[Tuple[Outgoing, Exception]]]:
+    """Send ``batch`` over ``connection`` (blocking).
+
+    Returns the connection to keep using and the messages that failed. A
+    reused connection the server has meanwhile dropped is replaced once;
+    after any other connection failure the rest of the batch fails too.
+    """
+    failures: List[Tuple[Outgoing, Exception]] = []
+    for index, item in enumerate(batch):
+        try:
+            reused = connection is not None
+            if connection is None:
+                connection = _connect()
+            try:
+                connection.send_message(item.message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if not reused:
+                    raise
+                connection.close()
+                connection = _connect()
+                connection.send_message(item.message)
+        except MESSAGE_ERRORS as e:
+            failures.append((item, e))
+        except (smtplib.SMTPException, OSError) as e:
+            if connection is not None:
+                connection.close()
+                connection = None
+            failures.extend((rest, e) for rest in batch[index:])
+            break
+    return connection, failures
+
+
+class Mailer:
+    """Queue emails and deliver them from a pool of SMTP connections."""
+
+    def __init__(self) -> None:
+        self.queue: Optional["asyncio.Queue[Outgoing]"] = None
+        self._senders: List[asyncio.Task] = []
+
+    @property
+    def enabled(self) -> bool:
+        """Whether SMTP delivery is configured."""
+        return bool(settings.SMTP_HOST and settings.EMAILS_FROM_EMAIL)
+
+    def start(self) -> None:
+        """Start the sender tasks."""
+        if not self.enabled:
+            logger.info("SMTP is not configured, emails will only be logged")
+            return
+        queue: "asyncio.Queue[Outgoing]" = asyncio.Queue(settings.MAIL_QUEUE_SIZE)
+        self.queue = queue
+        self._senders = [
+            asyncio.create_task(self._sender(queue))
+            for _ in range(settings.MAIL_POOL_SIZE)
+        ]
+
+    async def close(self) -> None:
+        """Give queued emails ``MAIL_DRAIN_TIMEOUT`` to go out, then stop."""
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), settings.MAIL_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Unsent emails discarded", count=self.queue.qsize())
+        for sender in self._senders:
+            sender.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+        self.queue = None
+        MAIL_QUEUE_DEPTH.set(0)
+
+    def send(self, template: str, to: str, **context: Any) -> bool:
+        """Queue an email; return False if it will not be sent."""
+        if self.queue is None:
+            logger.info("Email not sent", template=template, to=to)
+            return False
+        try:
+            self.queue.put_nowait(Outgoing(template, render(template, to, context)))
+        except asyncio.QueueFull:
+            MAIL_MESSAGES_TOTAL.labels(template, "dropped").inc()
+            logger.warning("Email queue full, email dropped", template=template)
+            return False
+        MAIL_QUEUE_DEPTH.set(self.queue.qsize())
+        return True
+
+    async def _sender(self, queue: "asyncio.Queue[Outgoing]") -> None:
+        connection: Optional[smtplib.SMTP] = None
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(
+                        queue.get(), settings.MAIL_IDLE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    if connection is not None:
+                        await run_in_threadpool(_close, connection)
+                        connection = None
+                    continue
+                batch = [first]
+                while len(batch) < settings.MAIL_BATCH_SIZE and not queue.empty():
+                    batch.append(queue.get_nowait())
+                MAIL_QUEUE_DEPTH.set(queue.qsize())
+                try:
+                    connection = await self._send_batch(connection, batch)
+                finally:
+                    for _ in batch:
+                        queue.task_done()
+        finally:
+            if connection is not None:
+                connection.close()
+
+    async def _send_batch(
+        self, connection: Optional[smtplib.SMTP], batch: List[Outgoing]
+    ) -> Optional[smtplib.SMTP]:
+        """Deliver a batch, retrying temporary failures with backoff."""
+        pending = batch
+        for attempt in range(settings.MAIL_MAX_RETRIES + 1):
+            if attempt:
+                MAIL_RETRIES_TOTAL.inc(len(pending))
+                await asyncio.sleep(settings.MAIL_RETRY_BACKOFF * 2 ** (attempt - 1))
+            connection, failures = await run_in_threadpool(
+                _deliver, connection, pending
+            )
+            failed = {id(item) for item, _ in failures}
+            for item in pending:
+                if id(item) not in failed:
+                    MAIL_MESSAGES_TOTAL.labels(item.template, "sent").inc()
+
+            pending = []
+            for item, error in failures:
+                if is_temporary(error) and attempt < settings.MAIL_MAX_RETRIES:
+                    pending.append(item)
+                    continue
+                MAIL_MESSAGES_TOTAL.labels(item.template, "failed").inc()
+                logger.error(
+                    "Email delivery failed",
+                    template=item.template,
+                    attempts=attempt + 1,
+                    error=str(error),
+                )
+            if not pending:
+                break
+        return connection
+
+
+mailer = Mailer()
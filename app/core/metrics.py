@@ -0,0 +1,196 @@
+"""Prometheus metrics exposition.
+
+With several uvicorn/gunicorn workers each process keeps its own registry,
+so a plain ``/metrics`` endpoint shows whichever worker served the scrape.
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (before the workers start, since
+``prometheus_client`` reads it at import time), every process writes its
+metrics to files there and a scrape aggregates all of them.
+
+Files of dead workers are tidied up before each render: their live gauges
+are dropped, and their counters and histograms are folded into a single
+archive file per type, so totals never go backwards and the directory does
+not grow with every worker restart.
+
+Rendered output is cached for ``METRICS_CACHE_SECONDS``. ``python -m
+app.core.metrics`` serves the same output on ``METRICS_PORT``, outside the
+main application and its middleware.
+"""
+
+import fcntl
+import glob
+import gzip
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+from prometheus_client.registry import CollectorRegistry
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Counter and histogram values of dead workers are summed into these files
+ARCHIVED_TYPES = ("counter", "histogram")
+
+
+def multiprocess_dir() -> Optional[str]:
+    """The shared metrics directory, or None in single-process mode."""
+    return os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir")
+    )
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _directory_lock(path: str, exclusive: bool) -> Iterator[None]:
+    """Keep renders from reading files while dead workers' are folded away."""
+    with open(os.path.join(path, ".lock"), "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _dead_worker_files(path: str) -> Dict[int, list]:
+    files: Dict[int, list] = {}
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        pid = os.path.basename(filename)[:-3].rsplit("_", 1)[-1]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            files.setdefault(int(pid), []).append(filename)
+    return files
+
+
+def _fold(archive: MmapedDict, filename: str) -> None:
+    for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+        total, _ = archive.read_value(key)
+        archive.write_value(key, total + value, timestamp)
+
+
+def collect_dead_workers(path: Optional[str] = None) -> int:
+    """Fold away the metric files of dead workers; return how many."""
+    path = path or multiprocess_dir()
+    if not path or not _dead_worker_files(path):
+        return 0
+
+    with _directory_lock(path, exclusive=True):
+        dead = _dead_worker_files(path)
+        archives: Dict[str, MmapedDict] = {}
+        try:
+            for pid, filenames in dead.items():
+                mark_process_dead(pid, path)
+                for filename in filenames:
+                    if not os.path.exists(filename):
+                        continue  # a live gauge, removed just above
+                    typ = os.path.basename(filename).split("_", 1)[0]
+                    if typ in ARCHIVED_TYPES:
+                        if typ not in archives:
+                            archives[typ] = MmapedDict(
+                                os.path.join(path, f"{typ}_archive.db")
+                            )
+                        _fold(archives[typ], filename)
+                    os.remove(filename)
+        finally:
+            for archive in archives.values():
+                archive.close()
+    logger.info("Metrics of dead workers collected", workers=len(dead))
+    return len(dead)
+
+
+def mark_worker_dead() -> None:
+    """Drop this process's live gauges when it shuts down cleanly."""
+    path = multiprocess_dir()
+    if path:
+        mark_process_dead(os.getpid(), path)
+
+
+def render() -> bytes:
+    """Render metrics from every worker (or this process alone)."""
+    path = multiprocess_dir()
+    if not path:
+        return generate_latest(REGISTRY)
+    collect_dead_workers(path)
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path)
+    with _directory_lock(path, exclusive=False):
+        return generate_latest(registry)
+
+
+class MetricsApp:
+    """ASGI app serving cached Prometheus metrics."""
+
+    def __init__(self, cache_seconds: Optional[float] = None):
+        self.cache_seconds = (
+            settings.METRICS_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        )
+        self._lock = threading.Lock()
+        self._cached: Optional[Tuple[float, bytes, Optional[bytes]]] = None
+
+    def output(self, compress: bool) -> bytes:
+        """Rendered metrics, re-rendered at most once per cache interval.
+
+        Concurrent scrapes wait for one render instead of each doing it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached[0] >= self.cache_seconds:
+                self._cached = (now, render(), None)
+            rendered_at, body, compressed = self._cached
+            if not compress:
+                return body
+            if compressed is None:
+                compressed = gzip.compress(body)
+                self._cached = (rendered_at, body, compressed)
+            return compressed
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"")
+        compress = b"gzip" in accept_encoding
+        body = await run_in_threadpool(self.output, compress)
+        headers = [
+            (b"content-type", CONTENT_TYPE_LATEST.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if compress:
+            headers.append((b"content-encoding", b"gzip"))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def main() -> None:
+    """Serve metrics on ``METRICS_PORT``, apart from the application."""
+    import uvicorn
+
+    if not multiprocess_dir():
+        raise SystemExit(
+            "PROMETHEUS_MULTIPROC_DIR must be set to serve the workers' metrics"
+        )
+    uvicorn.run(
+        MetricsApp(),
+        host=settings.METRICS_HOST,
+        port=settings.METRICS_PORT or 9100,
+        log_level=settings.LOG_LEVEL.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
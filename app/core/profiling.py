@@ -0,0 +1,199 @@
+"""On-demand sampling profiler.
+
+Stacks are sampled from a background thread with ``sys._current_frames()``
+and aggregated in the folded format understood by ``flamegraph.pl``,
+speedscope and similar tools (``frame;frame;frame count`` per line).
+
+Nothing in this module is wired into the application unless
+``PROFILING_ENABLED`` is set, so the cost is zero when profiling is off.
+"""
+
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import FrameType
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _fold(frame: Optional[FrameType]) -> str:
+    """Render a frame chain as a root-first folded stack."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Statistical profiler sampling thread stacks at a fixed interval."""
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples: Counter = Counter()
+        self.started_at: Optional[float] = None
+        self.duration: float = 0.0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        """Start sampling in a daemon thread."""
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        """Stop sampling and wait for the sampler thread to exit.
+
+        This blocks until the current sampling pass is done, so call it
+        through the threadpool from the event loop.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id:
+                    continue
+                if self.thread_id is not None and ident != self.thread_id:
+                    continue
+                self.samples[_fold(frame)] += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in folded (flamegraph-compatible) format."""
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self.samples.most_common()
+        )
+
+
+@dataclass
+class RequestProfile:
+    """Profile captured for a single request."""
+
+    id: str
+    method: str
+    path: str
+    duration: float
+    sample_count: int
+    collapsed: str = field(repr=False)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class ProfileStore:
+    """Bounded in-memory store of the most recent request profiles."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profile_store = ProfileStore(settings.PROFILING_MAX_STORED)
+
+# Only one aggregated window may run per worker at a time
+window_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """Profile requests selected by header token or by sampling rate.
+
+    Samples are taken from the event loop thread while the request is in
+    flight, so concurrent requests on the same worker show up in each
+    other's profiles. Use a low-traffic worker or the aggregated window
+    endpoint when that matters.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode("latin-1")
+        self.active = 0
+
+    def should_profile(self, scope: Scope) -> bool:
+        """Decide whether this request is profiled."""
+        if self.active >= settings.PROFILING_MAX_CONCURRENT:
+            return False
+        token = settings.PROFILING_TOKEN
+        if token:
+            for name, value in scope.get("headers", []):
+                if name == self.header:
+                    return hmac.compare_digest(value.decode("latin-1"), token)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        sampler = StackSampler(
+            settings.PROFILING_INTERVAL, thread_id=threading.get_ident()
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        self.active += 1
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await run_in_threadpool(sampler.stop)
+            self.active -= 1
+            profile_store.add(
+                RequestProfile(
+                    id=profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    duration=sampler.duration,
+                    sample_count=sum(sampler.samples.values()),
+                    collapsed=sampler.collapsed(),
+                )
+            )
+            logger.info(
+                "Request profiled",
+                profile_id=profile_id,
+                path=scope["path"],
+                duration=sampler.duration,
+            )
@@ -1,7 +1,8 @@
 """Security utilities."""
 
+import hashlib
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Dict, Optional, Union
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -13,6 +14,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT settings
 ALGORITHM = "HS256"
+# Tokens sent by email, never accepted as access tokens
+EMAIL_TOKEN_TYPES = ("verify_email", "reset_password")
 
 
 def create_access_token(
@@ -45,6 +48,38 @@ def create_refresh_token(
     return encoded_jwt
 
 
+def create_email_token(
+    subject: Union[str, Any], token_type: str, expires_delta: timedelta, **claims: Any
+) -> str:
+    """Create a single-purpose token to be sent by email."""
+    to_encode = {
+        "exp": datetime.utcnow() + expires_delta,
+        "sub": str(subject),
+        "type": token_type,
+        **claims,
+    }
+    token: str = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    return token
+
+
+def verify_email_token(token: str, token_type: str) -> Optional[Dict[str, Any]]:
+    """Decode an email token, if valid and of the expected type."""
+    try:
+        payload: Dict[str, Any] = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[ALGORITHM]
+        )
+    except jwt.JWTError:
+        return None
+    if payload.get("type") != token_type:
+        return None
+    return payload
+
+
+def password_fingerprint(hashed_password: str) -> str:
+    """Short digest of a password hash; changes whenever the password does."""
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:16]
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -61,6 +96,8 @@ def verify_token(token: str) -> Union[str, None]:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[ALGORITHM]
         )
+        if payload.get("type") in EMAIL_TOKEN_TYPES:
+            return None
         return payload.get("sub")
     except jwt.JWTError:
         return None
@@ -0,0 +1,29 @@
+"""Versioned online data migrations.
+
+Each migration rewrites the documents of one collection that still need
+it, in ``_id`` order and throttled batches, while the application keeps
+serving traffic. Progress is kept in the ``migrations`` collection, so a
+run can be stopped or crash at any point and continue later. Unlike
+``scripts/mongo-init.js``, migrations also reach existing databases.
+
+Run them with ``python -m app.db.migrations`` (``--dry-run`` to see what is
+pending and roughly how long it will take). New migrations are appended to
+``MIGRATIONS`` with the next version number; released ones never change.
+"""
+
+from typing import List
+
+from app.db.migrations.runner import Migration, MigrationLocked, MigrationRunner
+from app.db.migrations.users import (
+    BackfillArchivedUserSearchFields,
+    BackfillUserSearchFields,
+    DefaultEmailVerified,
+)
+
+MIGRATIONS: List[Migration] = [
+    BackfillUserSearchFields(),
+    BackfillArchivedUserSearchFields(),
+    DefaultEmailVerified(),
+]
+
+__all__ = ["MIGRATIONS", "Migration", "MigrationLocked", "MigrationRunner"]
@@ -0,0 +1,73 @@
+"""Apply pending data migrations: ``python -m app.db.migrations``."""
+
+import argparse
+import asyncio
+import json
+from typing import List, Optional
+
+from app.core.logging import setup_logging
+from app.db import mongodb
+from app.db.migrations import MIGRATIONS, MigrationLocked, MigrationRunner
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.db.migrations", description=__doc__
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report pending migrations and their estimated duration",
+    )
+    parser.add_argument("--target", type=int, help="stop after this migration version")
+    parser.add_argument(
+        "--batch-size", type=int, help="documents per batch (MIGRATION_BATCH_SIZE)"
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        help="minimum seconds between batches (MIGRATION_BATCH_PAUSE)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="take over migrations another runner appears to hold",
+    )
+    return parser.parse_args(argv)
+
+
+async def migrate(args: argparse.Namespace) -> int:
+    await mongodb.connect_to_mongo()
+    try:
+        runner = MigrationRunner(
+            MIGRATIONS, batch_size=args.batch_size, pause=args.pause, force=args.force
+        )
+        pending = [
+            migration
+            for migration in await runner.pending()
+            if args.target is None or migration.version <= args.target
+        ]
+        if not pending:
+            print("No pending migrations")
+            return 0
+        if args.dry_run:
+            for migration in pending:
+                print(json.dumps(await runner.estimate(migration)))
+            return 0
+        try:
+            await runner.run(args.target)
+        except MigrationLocked as e:
+            print(e)
+            return 1
+        return 0
+    finally:
+        await mongodb.close_mongo_connection()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    raise SystemExit(asyncio.run(migrate(parse_args(argv))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Batched migration runner."""
+
+import asyncio
+import math
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, PyMongoError
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.mongodb import DatabaseUnavailable, get_collection
+
+logger = get_logger(__name__)
+
+PROGRESS_COLLECTION = "migrations"
+# Outages to wait out: the breaker's, or the driver's own with it disabled
+UNAVAILABLE = (DatabaseUnavailable, ConnectionFailure)
+
+
+class Migration:
+    """A forward-only change to the matching documents of a collection.
+
+    Subclasses set ``version``, ``name`` and ``collection`` and implement
+    :meth:`query` and :meth:`transform`. ``query`` must match exactly the
+    documents that still need the change: it is re-checked on every write,
+    so a batch can be applied twice, and documents the application changed
+    in the meantime are left alone.
+    """
+
+    version: int
+    name: str
+    collection: str
+    projection: Optional[Dict[str, Any]] = None
+
+    def query(self) -> Dict[str, Any]:
+        """Filter for the documents still to be migrated."""
+        raise NotImplementedError
+
+    def transform(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update to apply to ``doc``, or None to leave it as it is."""
+        raise NotImplementedError
+
+
+class MigrationLocked(Exception):
+    """Raised when another runner is applying the same migration."""
+
+
+class MigrationRunner:
+    """Apply migrations in ``_id`` order, a throttled batch at a time.
+
+    Progress (the last ``_id`` done) is saved in the ``migrations``
+    collection after every batch, so an interrupted run resumes where it
+    stopped. Between batches the runner sleeps at least ``pause`` seconds,
+    and longer after slow batches, so that no more than ``duty_cycle`` of
+    the time goes to migrating. While the database is unreachable (or the
+    circuit breaker open) the runner waits and then carries on, instead of
+    adding load or giving up.
+    """
+
+    def __init__(
+        self,
+        migrations: Sequence[Migration],
+        *,
+        batch_size: Optional[int] = None,
+        pause: Optional[float] = None,
+        duty_cycle: Optional[float] = None,
+        force: bool = False,
+    ):
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Migration versions must be unique")
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+        self.pause = settings.MIGRATION_BATCH_PAUSE if pause is None else pause
+        self.duty_cycle = duty_cycle or settings.MIGRATION_DUTY_CYCLE
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Take over from other runners without waiting for their lock to go
+        # stale, e.g. to resume right after a crash
+        self.force = force
+        self.progress = get_collection(PROGRESS_COLLECTION)
+
+    async def pending(self) -> List[Migration]:
+        """Migrations not completed yet, oldest first."""
+        records = await deadline.run(
+            "migrations.pending",
+            lambda: self.progress.find({"state": "completed"}, {"_id": 1}).to_list(
+                length=None
+            ),
+        )
+        completed = {record["_id"] for record in records}
+        return [
+            migration
+            for migration in self.migrations
+            if migration.version not in completed
+        ]
+
+    async def run(self, target: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Apply pending migrations up to ``target``; return their records."""
+        records = []
+        for migration in await self.pending():
+            if target is not None and migration.version > target:
+                break
+            records.append(await self.apply(migration))
+        return records
+
+    async def apply(self, migration: Migration) -> Dict[str, Any]:
+        """Apply one migration, resuming from its saved progress."""
+        while True:
+            try:
+                record = await self._claim(migration)
+                break
+            except UNAVAILABLE:
+                await self._wait(migration)
+        collection = get_collection(migration.collection)
+        last_id = record["last_id"]
+        # Done since the last successful save
+        processed = modified = 0
+        logger.info(
+            "Migration started",
+            version=migration.version,
+            migration=migration.name,
+            resumed_after=str(last_id) if last_id is not None else None,
+        )
+        while True:
+            started = time.monotonic()
+            try:
+                docs = await self._read_batch(collection, migration, last_id)
+                if not docs:
+                    break
+                requests = []
+                for doc in docs:
+                    update = migration.transform(doc)
+                    if update:
+                        requests.append(
+                            UpdateOne({"_id": doc["_id"], **migration.query()}, update)
+                        )
+                if requests:
+                    result = await deadline.run(
+                        "migrations.write",
+                        lambda: collection.bulk_write(requests, ordered=False),
+                    )
+                    modified += result.modified_count
+                processed += len(docs)
+                last_id = docs[-1]["_id"]
+                await self._save(migration, last_id, processed, modified)
+                processed = modified = 0
+            except UNAVAILABLE:
+                await self._wait(migration)
+                await self._heartbeat(migration)
+                continue
+            await asyncio.sleep(self.pause_after(time.monotonic() - started))
+
+        while True:
+            try:
+                completed = await self._complete(migration, processed, modified)
+                break
+            except UNAVAILABLE:
+                await self._wait(migration)
+        if completed is None:
+            raise self._taken_over(migration)
+        logger.info(
+            "Migration completed",
+            version=migration.version,
+            migration=migration.name,
+            processed=completed["processed"],
+            modified=completed["modified"],
+        )
+        return completed
+
+    async def estimate(self, migration: Migration) -> Dict[str, Any]:
+        """Dry run: count what is left and estimate how long it will take.
+
+        One batch is read and transformed, without writing anything, and
+        writes are assumed to cost as much again.
+        """
+        record = (
+            await deadline.run(
+                "migrations.get",
+                lambda: self.progress.find_one({"_id": migration.version}),
+            )
+            or {}
+        )
+        if record.get("state") == "completed":
+            pending = 0
+            batch_seconds = 0.0
+        else:
+            collection = get_collection(migration.collection)
+            last_id = record.get("last_id")
+            pending = await deadline.run(
+                "migrations.count",
+                lambda: collection.count_documents(
+                    self._batch_query(migration, last_id)
+                ),
+            )
+            started = time.monotonic()
+            docs = await self._read_batch(collection, migration, last_id)
+            for doc in docs:
+                migration.transform(doc)
+            per_doc = (time.monotonic() - started) / max(len(docs), 1)
+            batch_seconds = 2 * per_doc * self.batch_size
+        batches = math.ceil(pending / self.batch_size)
+        return {
+            "version": migration.version,
+            "name": migration.name,
+            "state": record.get("state", "pending"),
+            "pending": pending,
+            "batches": batches,
+            "estimated_seconds": round(
+                batches * (batch_seconds + self.pause_after(batch_seconds)), 1
+            ),
+        }
+
+    def pause_after(self, batch_seconds: float) -> float:
+        """Seconds to sleep after a batch that took ``batch_seconds``."""
+        return max(self.pause, batch_seconds * (1 - self.duty_cycle) / self.duty_cycle)
+
+    def _batch_query(
+        self, migration: Migration, last_id: Optional[Any]
+    ) -> Dict[str, Any]:
+        if last_id is None:
+            return migration.query()
+        return {"$and": [migration.query(), {"_id": {"$gt": last_id}}]}
+
+    async def _read_batch(
+        self, collection: Any, migration: Migration, last_id: Optional[Any]
+    ) -> List[Dict[str, Any]]:
+        return await deadline.run(
+            "migrations.read",
+            lambda: collection.find(
+                self._batch_query(migration, last_id), migration.projection
+            )
+            .sort("_id", 1)
+            .limit(self.batch_size)
+            .to_list(length=self.batch_size),
+        )
+
+    async def _claim(self, migration: Migration) -> Dict[str, Any]:
+        """Take (or resume) ownership of a migration's progress record."""
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {
+            "_id": migration.version,
+            "state": {"$ne": "completed"},
+        }
+        if not self.force:
+            stale = now - timedelta(seconds=settings.MIGRATION_LOCK_TIMEOUT)
+            query["$or"] = [{"owner": self.owner}, {"heartbeat_at": {"$lt": stale}}]
+        try:
+            record: Dict[str, Any] = await deadline.run(
+                "migrations.claim",
+                lambda: self.progress.find_one_and_update(
+                    query,
+                    {
+                        "$set": {
+                            "name": migration.name,
+                            "state": "running",
+                            "owner": self.owner,
+                            "heartbeat_at": now,
+                        },
+                        "$setOnInsert": {
+                            "collection": migration.collection,
+                            "last_id": None,
+                            "processed": 0,
+                            "modified": 0,
+                            "started_at": now,
+                        },
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                ),
+            )
+        except DuplicateKeyError:
+            # The record exists but did not match: someone else holds it
+            raise MigrationLocked(
+                f"Migration {migration.version} ({migration.name}) is being "
+                "applied by another runner"
+            )
+        return record
+
+    async def _save(
+        self, migration: Migration, last_id: Any, processed: int, modified: int
+    ) -> None:
+        result = await deadline.run(
+            "migrations.save",
+            lambda: self.progress.update_one(
+                {"_id": migration.version, "owner": self.owner},
+                {
+                    "$set": {"last_id": last_id, "heartbeat_at": datetime.utcnow()},
+                    "$inc": {"processed": processed, "modified": modified},
+                },
+            ),
+        )
+        if result.matched_count == 0:
+            raise self._taken_over(migration)
+
+    async def _complete(
+        self, migration: Migration, processed: int, modified: int
+    ) -> Optional[Dict[str, Any]]:
+        """Mark the migration completed; None if it is no longer ours."""
+        record: Optional[Dict[str, Any]] = await deadline.run(
+            "migrations.complete",
+            lambda: self.progress.find_one_and_update(
+                {"_id": migration.version, "owner": self.owner},
+                {
+                    "$set": {"state": "completed", "completed_at": datetime.utcnow()},
+                    "$inc": {"processed": processed, "modified": modified},
+                },
+                return_document=ReturnDocument.AFTER,
+            ),
+        )
+        return record
+
+    async def _heartbeat(self, migration: Migration) -> None:
+        """Keep the claim fresh while no batch is being saved."""
+        try:
+            result = await deadline.run(
+                "migrations.heartbeat",
+                lambda: self.progress.update_one(
+                    {"_id": migration.version, "owner": self.owner},
+                    {"$set": {"heartbeat_at": datetime.utcnow()}},
+                ),
+            )
+        except (DatabaseUnavailable, PyMongoError) as e:
+            # Still unreachable; the claim survives MIGRATION_LOCK_TIMEOUT
+            logger.warning("Error refreshing migration heartbeat", error=str(e))
+            return
+        if result.matched_count == 0:
+            raise self._taken_over(migration)
+
+    async def _wait(self, migration: Migration) -> None:
+        logger.warning(
+            "Database unavailable, migration waiting", migration=migration.name
+        )
+        await asyncio.sleep(settings.MONGODB_BREAKER_OPEN_SECONDS)
+
+    def _taken_over(self, migration: Migration) -> MigrationLocked:
+        return MigrationLocked(
+            f"Migration {migration.version} ({migration.name}) was taken "
+            "over by another runner"
+        )
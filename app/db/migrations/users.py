@@ -0,0 +1,50 @@
+"""Migrations of user documents."""
+
+from typing import Any, Dict, Optional
+
+from app.db.migrations.runner import Migration
+from app.services.user_service import search_fields
+
+
+class BackfillUserSearchFields(Migration):
+    """Add the prefix-search keys to users created before search existed."""
+
+    version = 1
+    name = "backfill_user_search_fields"
+    collection = "users"
+    projection = {"full_name": 1, "email": 1}
+
+    def query(self) -> Dict[str, Any]:
+        return {
+            "$or": [
+                {"search_name": {"$exists": False}},
+                {"search_email": {"$exists": False}},
+            ]
+        }
+
+    def transform(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = search_fields(doc)
+        return {"$set": fields} if fields else None
+
+
+class BackfillArchivedUserSearchFields(BackfillUserSearchFields):
+    """The same for archived users, so they are searchable once restored."""
+
+    version = 2
+    name = "backfill_archived_user_search_fields"
+    collection = "users_archive"
+
+
+class DefaultEmailVerified(Migration):
+    """Store ``email_verified: false`` on users from before verification."""
+
+    version = 3
+    name = "default_email_verified"
+    collection = "users"
+    projection = {"_id": 1}
+
+    def query(self) -> Dict[str, Any]:
+        return {"email_verified": {"$exists": False}}
+
+    def transform(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return {"$set": {"email_verified": False}}
@@ -1,16 +1,212 @@
-"""MongoDB connection and configuration."""
+"""MongoDB connection and configuration.
 
+Database calls made through ``app.core.deadline.run`` also pass through a
+circuit breaker. The breaker watches the error rate and the slow-call rate
+over a rolling window. When either crosses its threshold it opens, and calls
+fail straight away with :class:`DatabaseUnavailable` (a 503) instead of each
+waiting out its own timeouts. After ``MONGODB_BREAKER_OPEN_SECONDS`` a few
+probe calls are let through (half-open). If they succeed the breaker closes,
+and if one fails it opens again.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo.errors import ConnectionFailure
+from prometheus_client import Counter, Gauge
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
 
 from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+MONGODB_CIRCUIT_STATE = Gauge(
+    "mongodb_circuit_state",
+    "MongoDB circuit breaker state (0 closed, 1 half-open, 2 open)",
+    multiprocess_mode="livemax",
+)
+MONGODB_CIRCUIT_TRANSITIONS_TOTAL = Counter(
+    "mongodb_circuit_transitions_total",
+    "MongoDB circuit breaker state changes",
+    ["state"],
+)
+MONGODB_CIRCUIT_REJECTED_TOTAL = Counter(
+    "mongodb_circuit_rejected_total",
+    "Database calls failed fast by the open circuit breaker",
+)
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when MongoDB is unreachable or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        *,
+        window: float,
+        min_calls: int,
+        failure_rate: float,
+        slow_call: float,
+        slow_rate: float,
+        open_seconds: float,
+        probes: int,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._probes_inflight = 0
+        self._probes_passed = 0
+        MONGODB_CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; reserves a probe slot when half-open."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_inflight + self._probes_passed >= self.probes:
+                return False
+            self._probes_inflight += 1
+        return True
+
+    def record(self, latency: float, failed: bool, probe: bool = False) -> None:
+        """Record the outcome of an allowed call."""
+        slow = latency >= self.slow_call
+        if probe != (self.state == HALF_OPEN) or self.state == OPEN:
+            # The state changed while the call ran, so its outcome is stale
+            return
+        if probe:
+            self._probes_inflight -= 1
+            if failed or slow:
+                self._open()
+            else:
+                self._probes_passed += 1
+                if self._probes_passed >= self.probes:
+                    self._transition(CLOSED)
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, old_failed, old_slow = self._calls.popleft()
+            self._failures -= old_failed
+            self._slow -= old_slow
+        total = len(self._calls)
+        if total >= self.min_calls and (
+            self._failures / total >= self.failure_rate
+            or self._slow / total >= self.slow_rate
+        ):
+            self._open()
+
+    def ignore(self, probe: bool = False) -> None:
+        """Forget an allowed call whose outcome says nothing about MongoDB."""
+        if probe and self.state == HALF_OPEN:
+            self._probes_inflight -= 1
+
+    async def call(self, operation: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run ``func`` through the breaker.
+
+        Connection failures become :class:`DatabaseUnavailable`. Server-side
+        timeouts count as slow calls, and other errors (duplicate keys,
+        validation) count as successes because the server answered.
+        """
+        if not self.allow():
+            MONGODB_CIRCUIT_REJECTED_TOTAL.inc()
+            raise DatabaseUnavailable(f"Circuit open, {operation} not attempted")
+        probe = self.state == HALF_OPEN
+        started = time.monotonic()
+        try:
+            result = await func()
+        except ConnectionFailure as e:
+            self.record(time.monotonic() - started, True, probe)
+            raise DatabaseUnavailable(f"Database unreachable during {operation}") from e
+        except ExecutionTimeout:
+            self.record(self.slow_call, False, probe)
+            raise
+        except asyncio.CancelledError:
+            self.ignore(probe)
+            raise
+        except Exception:
+            # Includes DeadlineExceeded: only slow if it actually took long
+            self.record(time.monotonic() - started, False, probe)
+            raise
+        self.record(time.monotonic() - started, False, probe)
+        return result
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        self._calls.clear()
+        self._failures = self._slow = 0
+        self._probes_inflight = self._probes_passed = 0
+        MONGODB_CIRCUIT_STATE.set(STATE_VALUES[state])
+        MONGODB_CIRCUIT_TRANSITIONS_TOTAL.labels(state).inc()
+        log = logger.warning if state == OPEN else logger.info
+        log("MongoDB circuit breaker state changed", state=state)
+
+
+def build_breaker() -> CircuitBreaker:
+    """Create the circuit breaker from settings."""
+    return CircuitBreaker(
+        window=settings.MONGODB_BREAKER_WINDOW,
+        min_calls=settings.MONGODB_BREAKER_MIN_CALLS,
+        failure_rate=settings.MONGODB_BREAKER_FAILURE_RATE,
+        slow_call=settings.MONGODB_BREAKER_SLOW_CALL,
+        slow_rate=settings.MONGODB_BREAKER_SLOW_RATE,
+        open_seconds=settings.MONGODB_BREAKER_OPEN_SECONDS,
+        probes=settings.MONGODB_BREAKER_PROBES,
+    )
+
+
+breaker = build_breaker()
+
+
+async def database_unavailable_handler(
+    request: Request, exc: Exception
+) -> JSONResponse:
+    """Turn an unavailable database into a 503 response."""
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "message": "Dependency unavailable: database"},
+        headers={
+            "Retry-After": str(max(1, int(settings.MONGODB_BREAKER_OPEN_SECONDS)))
+        },
+    )
+
+
 # Global database client
-client: AsyncIOMotorClient = None
-database: AsyncIOMotorDatabase = None
+client: Optional[AsyncIOMotorClient] = None
+database: Optional[AsyncIOMotorDatabase] = None
 
 
 async def connect_to_mongo() -> None:
@@ -22,6 +218,10 @@ async def connect_to_mongo() -> None:
             settings.MONGODB_URL,
             maxPoolSize=settings.MONGODB_MAX_CONNECTIONS,
             minPoolSize=settings.MONGODB_MIN_CONNECTIONS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
         )
         
         # Test the connection
@@ -44,6 +244,21 @@ async def close_mongo_connection() -> None:
         logger.info("Disconnected from MongoDB")
 
 
+async def create_indexes() -> None:
+    """Create the indexes the application relies on (idempotent)."""
+    db = get_database()
+    await db["users"].create_index("email", unique=True)
+    await db["users"].create_index([("search_name", 1), ("_id", 1)])
+    await db["users"].create_index([("search_email", 1), ("_id", 1)])
+    await db["users_archive"].create_index("email")
+    await db["files"].create_index([("owner_id", 1), ("_id", -1)])
+    await db["files"].create_index("sha256")
+    await db["idempotency_keys"].create_index(
+        "created_at", expireAfterSeconds=settings.IDEMPOTENCY_TTL
+    )
+    logger.info("MongoDB indexes ensured")
+
+
 def get_database() -> AsyncIOMotorDatabase:
     """Get database instance."""
     if database is None:
@@ -1,5 +1,6 @@
 """Main FastAPI application."""
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
@@ -9,12 +10,32 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import make_asgi_app
 
 from app.api.v1.api import api_router
+from app.core.admission import AdmissionControlMiddleware
 from app.core.config import settings
+from app.core.deadline import (
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    deadline_exceeded_handler,
+)
+from app.core.idempotency import IdempotencyMiddleware
 from app.core.logging import setup_logging
-from app.db.mongodb import connect_to_mongo, close_mongo_connection
+from app.core.mailer import mailer
+from app.core.metrics import (
+    MetricsApp,
+    collect_dead_workers,
+    mark_worker_dead,
+)
+from app.core.profiling import ProfilingMiddleware
+from app.db.mongodb import (
+    DatabaseUnavailable,
+    close_mongo_connection,
+    connect_to_mongo,
+    create_indexes,
+    database_unavailable_handler,
+)
+from app.services.user_service import report_collection_sizes, user_change_feed
 
 
 @asynccontextmanager
@@ -27,13 +48,28 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     
     # Connect to MongoDB
     await connect_to_mongo()
+    await create_indexes()
     logger.info("Connected to MongoDB")
     
+    mailer.start()
+    
+    stats_task = None
+    if settings.ENABLE_METRICS:
+        collect_dead_workers()
+        stats_task = asyncio.create_task(
+            report_collection_sizes(settings.COLLECTION_STATS_INTERVAL)
+        )
+    
     yield
     
     # Shutdown
+    if stats_task:
+        stats_task.cancel()
+    await user_change_feed.close()
+    await mailer.close()
     await close_mongo_connection()
     logger.info("Disconnected from MongoDB")
+    mark_worker_dead()
     logger.info("Shutting down Mars Landing Backend API")
 
 
@@ -49,6 +85,21 @@ def create_application() -> FastAPI:
         lifespan=lifespan,
     )
 
+    # Set up admission control (inside CORS so 503s stay readable by browsers)
+    if settings.ADMISSION_CONTROL_ENABLED:
+        app.add_middleware(AdmissionControlMiddleware)
+
+    # Set up idempotency keys (outside admission control so duplicates
+    # waiting for the first request do not hold admission slots)
+    if settings.IDEMPOTENCY_ENABLED:
+        app.add_middleware(IdempotencyMiddleware)
+
+    # Set up request deadlines and cancellation on client disconnect
+    # (outside admission control so queue time counts against the deadline)
+    app.add_middleware(DeadlineMiddleware)
+    app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+    app.add_exception_handler(DatabaseUnavailable, database_unavailable_handler)
+
     # Set up CORS
     if settings.cors_origins:
         app.add_middleware(
@@ -66,13 +117,17 @@ def create_application() -> FastAPI:
             allowed_hosts=settings.allowed_hosts_list,
         )
 
+    # Set up on-demand profiling (not installed at all when disabled)
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+
     # Include API router
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
-    # Add Prometheus metrics
-    if settings.ENABLE_METRICS:
-        metrics_app = make_asgi_app()
-        app.mount("/metrics", metrics_app)
+    # Add Prometheus metrics (unless served on their own port by
+    # ``python -m app.core.metrics``)
+    if settings.ENABLE_METRICS and settings.METRICS_PORT is None:
+        app.mount("/metrics", MetricsApp())
 
     # Health check endpoint
     @app.get("/health")
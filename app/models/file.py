@@ -0,0 +1,45 @@
+"""Uploaded file model."""
+
+from datetime import datetime
+
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+from app.models.user import PyObjectId
+
+
+class FileBase(BaseModel):
+    """Base uploaded file model."""
+
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str = "application/octet-stream"
+    size: int = Field(..., ge=0)
+    sha256: str
+
+
+class FileInDB(FileBase):
+    """Uploaded file in database model."""
+
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    owner_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str},
+    }
+
+
+class File(FileBase):
+    """Uploaded file response model."""
+
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    owner_id: str
+    created_at: datetime
+
+    model_config = {
+        "populate_by_name": True,
+        "arbitrary_types_allowed": True,
+        "json_encoders": {ObjectId: str},
+    }
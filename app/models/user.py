@@ -1,9 +1,10 @@
 """User model."""
 
+import re
 from datetime import datetime
-from typing import Optional, Annotated
+from typing import Any, Dict, List, Literal, Optional, Annotated
 
-from pydantic import BaseModel, EmailStr, Field, GetJsonSchemaHandler
+from pydantic import BaseModel, EmailStr, Field, GetJsonSchemaHandler, model_validator
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 from bson import ObjectId
@@ -55,11 +56,58 @@ class UserUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class UserFilter(BaseModel):
+    """Filter selecting users for bulk operations."""
+    
+    ids: Optional[List[str]] = Field(None, min_length=1, max_length=100000)
+    email_domain: Optional[str] = Field(None, min_length=1, max_length=255)
+    is_active: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    
+    @model_validator(mode="after")
+    def check_not_empty(self) -> "UserFilter":
+        """Refuse an empty filter so a bulk action never hits every user by accident."""
+        for user_id in self.ids or []:
+            if not ObjectId.is_valid(user_id):
+                raise ValueError(f"Invalid user id: {user_id}")
+        if not self.to_query():
+            raise ValueError("At least one filter criterion is required")
+        return self
+    
+    def to_query(self) -> Dict[str, Any]:
+        """Build the MongoDB query for this filter."""
+        query: Dict[str, Any] = {}
+        if self.ids is not None:
+            query["_id"] = {"$in": [ObjectId(user_id) for user_id in self.ids]}
+        if self.email_domain is not None:
+            domain = self.email_domain.lstrip("@").lower()
+            query["email"] = {"$regex": f"@{re.escape(domain)}$", "$options": "i"}
+        if self.is_active is not None:
+            query["is_active"] = self.is_active
+        if self.created_after or self.created_before:
+            query["created_at"] = {}
+            if self.created_after:
+                query["created_at"]["$gte"] = self.created_after
+            if self.created_before:
+                query["created_at"]["$lt"] = self.created_before
+        return query
+
+
+class UserBulkAction(BaseModel):
+    """Bulk activate/deactivate/delete request model."""
+    
+    filter: UserFilter
+    action: Literal["activate", "deactivate", "delete"]
+    dry_run: bool = False
+
+
 class UserInDB(UserBase):
     """User in database model."""
     
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     hashed_password: str
+    email_verified: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -74,6 +122,7 @@ class User(UserBase):
     """User response model."""
     
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    email_verified: bool = False
     created_at: datetime
     updated_at: datetime
 
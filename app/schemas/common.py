@@ -2,7 +2,7 @@
 
 from typing import Any, Dict, Generic, List, Optional, TypeVar
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, EmailStr, Field
 
 DataT = TypeVar('DataT')
 
@@ -40,6 +40,13 @@ class PaginatedResponse(BaseModel, Generic[DataT]):
     pages: int
 
 
+class CursorPage(BaseModel, Generic[DataT]):
+    """Keyset-paginated response model."""
+    
+    items: List[DataT]
+    next_cursor: Optional[str] = None
+
+
 class Token(BaseModel):
     """Token response model."""
     
@@ -54,3 +61,32 @@ class TokenPayload(BaseModel):
     sub: Optional[str] = None
     exp: Optional[int] = None
     type: Optional[str] = None
+
+
+class EmailVerification(BaseModel):
+    """Email verification request model."""
+    
+    token: str
+
+
+class PasswordRecovery(BaseModel):
+    """Password recovery request model."""
+    
+    email: EmailStr
+
+
+class PasswordReset(BaseModel):
+    """Password reset request model."""
+    
+    token: str
+    new_password: str = Field(..., min_length=8, max_length=100)
+
+
+class JobStatus(BaseModel):
+    """Background job status model."""
+    
+    id: str
+    state: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
@@ -0,0 +1,46 @@
+"""Account emails: signup verification and password reset."""
+
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from app.core.config import settings
+from app.core.mailer import mailer
+from app.core.security import create_email_token, password_fingerprint
+from app.models.user import User, UserInDB
+
+
+def _link(path: str, token: str) -> str:
+    return f"{settings.FRONTEND_URL.rstrip('/')}{path}?{urlencode({'token': token})}"
+
+
+def send_verification_email(user: User) -> bool:
+    """Queue the email asking a new user to confirm their address."""
+    hours = settings.EMAIL_VERIFY_TOKEN_EXPIRE_HOURS
+    token = create_email_token(user.id, "verify_email", timedelta(hours=hours))
+    return mailer.send(
+        "verify_email",
+        user.email,
+        full_name=user.full_name,
+        link=_link("/verify-email", token),
+        expire_hours=hours,
+        project_name=settings.PROJECT_NAME,
+    )
+
+
+def send_password_reset_email(user: UserInDB) -> bool:
+    """Queue a password reset link, valid until the password changes."""
+    hours = settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS
+    token = create_email_token(
+        user.id,
+        "reset_password",
+        timedelta(hours=hours),
+        pwd=password_fingerprint(user.hashed_password),
+    )
+    return mailer.send(
+        "reset_password",
+        user.email,
+        full_name=user.full_name,
+        link=_link("/reset-password", token),
+        expire_hours=hours,
+        project_name=settings.PROJECT_NAME,
+    )
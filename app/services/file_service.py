@@ -0,0 +1,276 @@
+"""File upload service.
+
+Uploads are streamed to a temporary file under ``UPLOAD_DIR`` as they
+arrive, so a file is never held in memory whole, and ``MAX_FILE_SIZE`` is
+enforced while reading rather than after. The SHA-256 of the content is
+computed on the way and names the stored blob
+(``UPLOAD_DIR/blobs/ab/abcdef...``): the same content uploaded twice is
+stored once. Every upload gets its own document in the ``files``
+collection, and a blob is removed with the last document pointing at it.
+"""
+
+import hashlib
+import os
+import tempfile
+import uuid
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple
+
+from prometheus_client import Counter
+from starlette.concurrency import run_in_threadpool
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.logging import get_logger
+from app.db.mongodb import DatabaseUnavailable, get_collection
+from app.models.file import File, FileInDB
+
+logger = get_logger(__name__)
+
+FILE_UPLOADS_TOTAL = Counter(
+    "file_uploads_total",
+    "Uploads by outcome (stored, deduplicated, too_large, failed)",
+    ["outcome"],
+)
+FILE_UPLOAD_BYTES_TOTAL = Counter(
+    "file_upload_bytes_total", "Bytes received in completed uploads"
+)
+
+WRITE_BUFFER = 1024 * 1024  # bytes gathered before each disk write
+
+
+class FileTooLarge(Exception):
+    """Raised when an upload exceeds ``MAX_FILE_SIZE``."""
+
+
+def blob_path(sha256: str) -> str:
+    """Where the content with this hash is stored."""
+    return os.path.join(settings.UPLOAD_DIR, "blobs", sha256[:2], sha256)
+
+
+def temp_dir() -> str:
+    """Directory for uploads in progress (same filesystem as the blobs)."""
+    return os.path.join(settings.UPLOAD_DIR, "tmp")
+
+
+def clean_filename(filename: Optional[str]) -> str:
+    """Client-supplied filename reduced to a safe display name."""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    name = "".join(ch for ch in name if ch.isprintable()).strip()
+    return name[:255] or "upload"
+
+
+def _write(handle: BinaryIO, digest: "hashlib._Hash", block: bytearray) -> None:
+    digest.update(block)
+    handle.write(block)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _retire(sha256: str) -> Optional[str]:
+    """Move a blob out of place; return where it went, or None if gone."""
+    retired = os.path.join(temp_dir(), f"{sha256}.{uuid.uuid4().hex}.deleting")
+    os.makedirs(temp_dir(), exist_ok=True)
+    try:
+        # Renaming keeps the blob's old mtime; refresh it first so the
+        # partial upload cleanup does not take this for an abandoned file
+        os.utime(blob_path(sha256))
+        os.replace(blob_path(sha256), retired)
+    except FileNotFoundError:
+        return None  # removed by a concurrent delete
+    return retired
+
+
+def _reinstate(retired: str, sha256: str) -> None:
+    """Put a retired blob back (over an identical copy stored meanwhile)."""
+    os.replace(retired, blob_path(sha256))
+
+
+def _commit(temp_path: str, sha256: str) -> bool:
+    """Move a finished upload into place; False if already stored."""
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return True
+
+
+async def receive_file(
+    chunks: AsyncIterator[bytes], max_size: int
+) -> Tuple[str, int, str]:
+    """Stream ``chunks`` to a temporary file; return (path, size, sha256).
+
+    Writes and hashing run in the threadpool, a megabyte at a time. The
+    temporary file is removed if the upload fails, is cancelled or grows
+    past ``max_size``.
+    """
+    os.makedirs(temp_dir(), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir(), suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge()
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER:
+                    await run_in_threadpool(_write, handle, digest, buffer)
+                    buffer = bytearray()
+            if buffer:
+                await run_in_threadpool(_write, handle, digest, buffer)
+    except BaseException as e:
+        _remove(temp_path)
+        FILE_UPLOADS_TOTAL.labels(
+            "too_large" if isinstance(e, FileTooLarge) else "failed"
+        ).inc()
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+class FileService:
+    """Uploaded file storage and metadata."""
+
+    def __init__(self) -> None:
+        self.collection = get_collection("files")
+
+    async def upload(
+        self,
+        owner_id: str,
+        filename: Optional[str],
+        content_type: Optional[str],
+        chunks: AsyncIterator[bytes],
+    ) -> File:
+        """Store an upload streamed as ``chunks`` and record its metadata.
+
+        The document is inserted before the blob is moved into place, so a
+        concurrent delete of the last other copy never removes the blob
+        out from under it.
+        """
+        temp_path, size, sha256 = await receive_file(chunks, settings.MAX_FILE_SIZE)
+        file_in_db = FileInDB(
+            filename=clean_filename(filename),
+            content_type=content_type or "application/octet-stream",
+            size=size,
+            sha256=sha256,
+            owner_id=owner_id,
+        )
+        file_doc = file_in_db.model_dump(by_alias=True)
+        try:
+            await deadline.run(
+                "files.create", lambda: self.collection.insert_one(file_doc)
+            )
+        except BaseException:
+            _remove(temp_path)
+            FILE_UPLOADS_TOTAL.labels("failed").inc()
+            raise
+        try:
+            # Only renames, and nothing to await between them and the insert
+            stored = _commit(temp_path, sha256)
+        except OSError:
+            _remove(temp_path)
+            FILE_UPLOADS_TOTAL.labels("failed").inc()
+            await self.collection.delete_one({"_id": file_in_db.id})
+            raise
+
+        FILE_UPLOADS_TOTAL.labels("stored" if stored else "deduplicated").inc()
+        FILE_UPLOAD_BYTES_TOTAL.inc(size)
+        logger.info(
+            "File uploaded",
+            file_id=str(file_in_db.id),
+            size=size,
+            deduplicated=not stored,
+        )
+        return File(**file_doc)
+
+    async def get_by_id(self, file_id: str) -> Optional[File]:
+        """Get file metadata by ID."""
+        try:
+            from bson import ObjectId
+
+            file_doc = await deadline.run(
+                "files.get_by_id",
+                lambda: self.collection.find_one({"_id": ObjectId(file_id)}),
+            )
+            if file_doc:
+                return File(**file_doc)
+            return None
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
+        except Exception as e:
+            logger.error("Error getting file by ID", file_id=file_id, error=str(e))
+            return None
+
+    async def get_multi(
+        self, owner_id: str, *, skip: int = 0, limit: int = 100
+    ) -> List[File]:
+        """Get an owner's files, newest first."""
+        try:
+            file_docs = await deadline.run(
+                "files.get_multi",
+                lambda: self.collection.find({"owner_id": owner_id})
+                .sort("_id", -1)
+                .skip(skip)
+                .limit(limit)
+                .to_list(length=limit),
+            )
+            return [File(**file_doc) for file_doc in file_docs]
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
+        except Exception as e:
+            logger.error("Error getting files", owner_id=owner_id, error=str(e))
+            return []
+
+    async def delete(self, file: File) -> bool:
+        """Delete a file's metadata, and its blob if nothing else uses it.
+
+        An upload of the same content can record a new reference at any
+        time, in another process, and finds the blob already in place. So
+        the blob is first moved aside and references are counted again
+        afterwards: an upload recorded before that count gets the blob
+        back, and one recorded after it finds the blob gone and stores its
+        own copy.
+        """
+        try:
+            result = await deadline.run(
+                "files.delete", lambda: self.collection.delete_one({"_id": file.id})
+            )
+            if result.deleted_count == 0:
+                return False
+            if await self._referenced(file.sha256):
+                return True
+            retired = await run_in_threadpool(_retire, file.sha256)
+            if retired is None:
+                return True
+            try:
+                referenced = await self._referenced(file.sha256)
+            except BaseException:
+                await run_in_threadpool(_reinstate, retired, file.sha256)
+                raise
+            if referenced:
+                await run_in_threadpool(_reinstate, retired, file.sha256)
+            else:
+                await run_in_threadpool(_remove, retired)
+            return True
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
+        except Exception as e:
+            logger.error("Error deleting file", file_id=str(file.id), error=str(e))
+            return False
+
+    async def _referenced(self, sha256: str) -> bool:
+        """Whether any file still points at the blob ``sha256``."""
+        count: int = await deadline.run(
+            "files.count_blob_refs",
+            lambda: self.collection.count_documents({"sha256": sha256}, limit=1),
+        )
+        return count > 0
@@ -1,29 +1,187 @@
 """User service."""
 
-from typing import Any, Dict, Optional, Union
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from app.core.security import get_password_hash, verify_password
-from app.db.mongodb import get_collection
-from app.models.user import User, UserCreate, UserInDB, UserUpdate
+from fastapi.encoders import jsonable_encoder
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from pymongo.results import UpdateResult
+
+from app.core import deadline
+from app.core.changefeed import ChangeFeed
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.security import get_password_hash, password_fingerprint, verify_password
+from app.db.mongodb import DatabaseUnavailable, get_collection
+from app.models.user import User, UserBase, UserCreate, UserInDB, UserUpdate
 from app.core.logging import get_logger
+from app.utils.text import normalize_search_text
 
 logger = get_logger(__name__)
 
+USERS_ARCHIVED_TOTAL = Counter(
+    "users_archived_total", "Users moved to the archive collection"
+)
+USERS_RESTORED_TOTAL = Counter(
+    "users_restored_total", "Archived users restored on demand"
+)
+USER_RESTORE_SECONDS = Histogram(
+    "user_restore_seconds",
+    "Time taken to restore an archived user",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+USER_COLLECTION_DOCUMENTS = Gauge(
+    "user_collection_documents",
+    "Users stored per tier",
+    ["tier"],
+    multiprocess_mode="livemax",
+)
+USER_COLLECTION_DATA_BYTES = Gauge(
+    "user_collection_data_bytes",
+    "Uncompressed user data size per tier",
+    ["tier"],
+    multiprocess_mode="livemax",
+)
+USER_COLLECTION_INDEX_BYTES = Gauge(
+    "user_collection_index_bytes",
+    "User index size per tier",
+    ["tier"],
+    multiprocess_mode="livemax",
+)
+
+# Sorts after any character, so [prefix, prefix + MAX_CHAR) spans a prefix
+MAX_CHAR = "\U0010ffff"
+
+
+def search_fields(user_data: Dict[str, Any]) -> Dict[str, str]:
+    """Normalized prefix-search keys for the name/email present in ``user_data``."""
+    fields = {}
+    if user_data.get("full_name") is not None:
+        fields["search_name"] = normalize_search_text(user_data["full_name"])
+    if user_data.get("email") is not None:
+        fields["search_email"] = user_data["email"].lower()
+    return fields
+
+
+def encode_cursor(key: str, user_id: Any) -> str:
+    """Opaque keyset cursor pointing after (key, _id)."""
+    raw = json.dumps([key, str(user_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    """Inverse of :func:`encode_cursor`; raises ValueError if malformed."""
+    from bson import ObjectId
+    
+    try:
+        key, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return key, ObjectId(user_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+# Fields that may appear in change events (never password hashes)
+PUBLIC_USER_FIELDS = set(UserBase.model_fields) | {
+    "email_verified",
+    "created_at",
+    "updated_at",
+}
+
+
+def user_change(change: Mapping[str, Any]) -> Dict[str, Any]:
+    """Client-facing payload of a ``users`` change-stream event."""
+    data: Dict[str, Any] = {"id": str(change["documentKey"]["_id"])}
+    if change.get("fullDocument"):
+        fields = change["fullDocument"]
+    elif "updateDescription" in change:
+        fields = change["updateDescription"]["updatedFields"]
+        data["removed"] = [
+            field
+            for field in change["updateDescription"]["removedFields"]
+            if field in PUBLIC_USER_FIELDS
+        ]
+    else:
+        fields = {}
+    data["fields"] = jsonable_encoder(
+        {key: value for key, value in fields.items() if key in PUBLIC_USER_FIELDS}
+    )
+    return data
+
+
+user_change_feed = ChangeFeed(
+    "users",
+    user_change,
+    pipeline=[
+        {
+            "$match": {
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+            }
+        }
+    ],
+)
+
+
+def inactive_query(cutoff: datetime) -> Dict[str, Any]:
+    """Users with neither a login nor an update since ``cutoff``."""
+    return {
+        "is_superuser": False,
+        "updated_at": {"$lt": cutoff},
+        "$or": [
+            {"last_login_at": {"$lt": cutoff}},
+            {"last_login_at": {"$exists": False}},
+        ],
+    }
+
+
+async def report_collection_sizes(interval: float) -> None:
+    """Refresh the hot/cold size gauges every ``interval`` seconds."""
+    while True:
+        try:
+            sizes = await UserService().collection_sizes()
+            for tier, stats in sizes.items():
+                USER_COLLECTION_DOCUMENTS.labels(tier).set(stats["documents"])
+                USER_COLLECTION_DATA_BYTES.labels(tier).set(stats["data_bytes"])
+                USER_COLLECTION_INDEX_BYTES.labels(tier).set(stats["index_bytes"])
+        except PyMongoError as e:
+            logger.warning("Error reading user collection sizes", error=str(e))
+        await asyncio.sleep(interval)
+
 
 class UserService:
     """User service for database operations."""
     
     def __init__(self):
         self.collection = get_collection("users")
+        self.archive = get_collection("users_archive")
     
     async def get_by_id(self, user_id: str) -> Optional[User]:
         """Get user by ID."""
         try:
             from bson import ObjectId
-            user_doc = await self.collection.find_one({"_id": ObjectId(user_id)})
+            user_doc = await deadline.run(
+                "users.get_by_id",
+                lambda: self.collection.find_one({"_id": ObjectId(user_id)}),
+            )
             if user_doc:
                 return User(**user_doc)
             return None
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
         except Exception as e:
             logger.error("Error getting user by ID", user_id=user_id, error=str(e))
             return None
@@ -31,10 +189,12 @@ class UserService:
     async def get_by_email(self, email: str) -> Optional[User]:
         """Get user by email."""
         try:
-            user_doc = await self.collection.find_one({"email": email})
+            user_doc = await self._find_by_email("users.get_by_email", email)
             if user_doc:
                 return User(**user_doc)
             return None
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
         except Exception as e:
             logger.error("Error getting user by email", email=email, error=str(e))
             return None
@@ -44,15 +204,74 @@ class UserService:
     ) -> list[User]:
         """Get multiple users."""
         try:
-            cursor = self.collection.find().skip(skip).limit(limit)
-            users = []
-            async for user_doc in cursor:
-                users.append(User(**user_doc))
-            return users
+            user_docs = await deadline.run(
+                "users.get_multi",
+                lambda: self.collection.find()
+                .skip(skip)
+                .limit(limit)
+                .to_list(length=limit),
+            )
+            return [User(**user_doc) for user_doc in user_docs]
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
         except Exception as e:
             logger.error("Error getting multiple users", error=str(e))
             return []
     
+    async def search(
+        self,
+        q: str,
+        *,
+        field: str = "name",
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[User], Optional[str]]:
+        """Prefix search on the normalized name or lowercased email.
+        
+        The query is a range scan on the ``(search_<field>, _id)`` index, and
+        paging is keyset based, so each call reads at most ``limit + 1`` index
+        entries whatever the page or collection size.
+        """
+        key_field = f"search_{field}"
+        prefix = normalize_search_text(q) if field == "name" else q.strip().lower()
+        if not prefix:
+            return [], None
+        upper = prefix + MAX_CHAR
+        query: Dict[str, Any]
+        if cursor:
+            last_key, last_id = decode_cursor(cursor)
+            query = {
+                "$or": [
+                    {key_field: {"$gt": last_key, "$lt": upper}},
+                    {key_field: last_key, "_id": {"$gt": last_id}},
+                ]
+            }
+        else:
+            query = {key_field: {"$gte": prefix, "$lt": upper}}
+        
+        user_docs = await deadline.run(
+            "users.search",
+            lambda: self.collection.find(query, {"hashed_password": 0})
+            .sort([(key_field, 1), ("_id", 1)])
+            .limit(limit + 1)
+            .to_list(length=limit + 1),
+        )
+        
+        next_cursor = None
+        if len(user_docs) > limit:
+            user_docs = user_docs[:limit]
+            last = user_docs[-1]
+            next_cursor = encode_cursor(last[key_field], last["_id"])
+        return [User(**user_doc) for user_doc in user_docs], next_cursor
+    
+    async def iter_all(self, *, batch_size: int = 1000) -> AsyncIterator[User]:
+        """Iterate over every user in ``_id`` order."""
+        cursor = self.collection.find(
+            {}, {"hashed_password": 0}, batch_size=batch_size
+        ).sort("_id", 1)
+        async for user_doc in cursor:
+            yield User(**user_doc)
+    
     async def create(self, user_in: UserCreate) -> User:
         """Create new user."""
         try:
@@ -67,7 +286,12 @@ class UserService:
             del user_dict["password"]  # Remove plain password
             
             user_in_db = UserInDB(**user_dict)
-            result = await self.collection.insert_one(user_in_db.dict(by_alias=True))
+            user_doc = user_in_db.dict(by_alias=True)
+            user_doc.update(search_fields(user_doc))
+            result = await deadline.run(
+                "users.create",
+                lambda: self.collection.insert_one(user_doc),
+            )
             
             # Return created user without password
             created_user = await self.get_by_id(str(result.inserted_id))
@@ -82,18 +306,21 @@ class UserService:
         """Update user."""
         try:
             from bson import ObjectId
-            from datetime import datetime
             
             update_data = user_in.dict(exclude_unset=True)
             if "password" in update_data:
                 update_data["hashed_password"] = get_password_hash(update_data["password"])
                 del update_data["password"]
             
+            update_data.update(search_fields(update_data))
             update_data["updated_at"] = datetime.utcnow()
             
-            result = await self.collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": update_data}
+            result = await deadline.run(
+                "users.update",
+                lambda: self.collection.update_one(
+                    {"_id": ObjectId(user_id)},
+                    {"$set": update_data}
+                ),
             )
             
             if result.modified_count:
@@ -103,12 +330,256 @@ class UserService:
             logger.error("Error updating user", user_id=user_id, error=str(e))
             raise
     
+    async def count(self, query: Dict[str, Any]) -> int:
+        """Count users matching a query, archived users included."""
+        hot = await deadline.run(
+            "users.count", lambda: self.collection.count_documents(query)
+        )
+        cold = await deadline.run(
+            "users.count_archived", lambda: self.archive.count_documents(query)
+        )
+        return int(hot + cold)
+    
+    async def bulk_apply(
+        self,
+        query: Dict[str, Any],
+        action: str,
+        *,
+        chunk_size: int = 1000,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """Activate, deactivate or delete all users matching a query.
+        
+        Matching ids are read in ``_id`` order, one chunk at a time, and each
+        chunk is changed with one ``update_many``/``delete_many`` round trip.
+        Archived users are changed too (after ``users``, so that users
+        archived meanwhile are not missed); otherwise they would come back
+        unchanged when restored. Returns the number of users changed.
+        """
+        update = {
+            "$set": {
+                "is_active": action == "activate",
+                "updated_at": datetime.utcnow(),
+            }
+        }
+        
+        def apply(collection: Any, ids: List[Any]) -> Any:
+            if action == "delete":
+                return collection.delete_many({"_id": {"$in": ids}})
+            return collection.update_many({"_id": {"$in": ids}}, update)
+        
+        changed = 0
+        processed = 0
+        tiers = (("users", self.collection), ("users_archive", self.archive))
+        for tier, collection in tiers:
+            last_id = None
+            while True:
+                chunk_query = query
+                if last_id is not None:
+                    chunk_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+                docs = await deadline.run(
+                    f"{tier}.bulk_apply.scan",
+                    lambda: collection.find(chunk_query, {"_id": 1})
+                    .sort("_id", 1)
+                    .limit(chunk_size)
+                    .to_list(length=chunk_size),
+                )
+                if not docs:
+                    break
+                ids = [doc["_id"] for doc in docs]
+                result = await deadline.run(
+                    f"{tier}.bulk_apply.{action}", lambda: apply(collection, ids)
+                )
+                changed += (
+                    result.deleted_count
+                    if action == "delete"
+                    else result.modified_count
+                )
+                processed += len(ids)
+                last_id = ids[-1]
+                if progress:
+                    progress(processed)
+        
+        logger.info("Bulk user action applied", action=action, changed=changed)
+        return changed
+    
+    async def archive_inactive(
+        self,
+        cutoff: datetime,
+        *,
+        batch_size: int = 500,
+        pause: float = 0.0,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """Move users inactive since ``cutoff`` to the archive collection.
+        
+        Users are copied in ``_id`` order, one batch at a time, and only
+        deleted from ``users`` once the copy is written, so a crash never
+        loses anyone. A user who logs in between the copy and the delete
+        stays in ``users`` and the copy is discarded. Returns the number of
+        users archived.
+        """
+        query = inactive_query(cutoff)
+        archived = 0
+        last_id = None
+        while True:
+            batch_query = query
+            if last_id is not None:
+                batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            docs = await deadline.run(
+                "users.archive.scan",
+                lambda: self.collection.find(batch_query)
+                .sort("_id", 1)
+                .limit(batch_size)
+                .to_list(length=batch_size),
+            )
+            if not docs:
+                break
+            ids = [doc["_id"] for doc in docs]
+            last_id = ids[-1]
+            
+            archived_at = datetime.utcnow()
+            copies = [dict(doc, archived_at=archived_at) for doc in docs]
+            try:
+                await deadline.run(
+                    "users.archive.copy",
+                    lambda: self.archive.insert_many(copies, ordered=False),
+                )
+            except BulkWriteError as e:
+                # Copies left by an interrupted earlier run may be stale
+                for error in e.details["writeErrors"]:
+                    if error["code"] != 11000:
+                        raise
+                    copy = copies[error["index"]]
+                    await deadline.run(
+                        "users.archive.recopy",
+                        lambda: self.archive.replace_one({"_id": copy["_id"]}, copy),
+                    )
+            result = await deadline.run(
+                "users.archive.delete",
+                lambda: self.collection.delete_many(
+                    {"$and": [query, {"_id": {"$in": ids}}]}
+                ),
+            )
+            if result.deleted_count < len(ids):
+                kept = await deadline.run(
+                    "users.archive.kept",
+                    lambda: self.collection.distinct("_id", {"_id": {"$in": ids}}),
+                )
+                await deadline.run(
+                    "users.archive.discard",
+                    lambda: self.archive.delete_many({"_id": {"$in": kept}}),
+                )
+            
+            archived += result.deleted_count
+            USERS_ARCHIVED_TOTAL.inc(result.deleted_count)
+            if progress:
+                progress(archived)
+            if pause:
+                await asyncio.sleep(pause)
+        
+        logger.info("Inactive users archived", archived=archived)
+        return archived
+    
+    async def collection_sizes(self) -> Dict[str, Dict[str, int]]:
+        """Document count and data/index size of the hot and cold collections."""
+        sizes = {}
+        for tier, collection in (("hot", self.collection), ("cold", self.archive)):
+            try:
+                stats = await collection.aggregate(
+                    [{"$collStats": {"storageStats": {}}}]
+                ).to_list(length=1)
+                storage = stats[0]["storageStats"] if stats else {}
+            except PyMongoError:
+                # The archive does not exist until the first user is archived
+                storage = {}
+            sizes[tier] = {
+                "documents": storage.get("count", 0),
+                "data_bytes": storage.get("size", 0),
+                "index_bytes": storage.get("totalIndexSize", 0),
+            }
+        return sizes
+    
+    async def _find_by_email(
+        self, operation: str, email: str
+    ) -> Optional[Dict[str, Any]]:
+        """Find a user document, restoring it from the archive if needed."""
+        user_doc: Optional[Dict[str, Any]] = await deadline.run(
+            operation, lambda: self.collection.find_one({"email": email})
+        )
+        if user_doc is None:
+            user_doc = await self._restore({"email": email})
+        return user_doc
+    
+    async def _restore(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Move an archived user back to ``users`` and return it.
+
+        Any lookup can restore a user (login, signup's duplicate check,
+        password recovery), so the restore counts as activity: without a
+        fresh ``last_login_at`` the next archive run would move the user
+        straight back.
+        """
+        started = time.perf_counter()
+        user_doc: Optional[Dict[str, Any]] = await deadline.run(
+            "users.restore.find", lambda: self.archive.find_one(query)
+        )
+        if user_doc is None:
+            return None
+        
+        user_doc.pop("archived_at", None)
+        user_doc["last_login_at"] = datetime.utcnow()
+        try:
+            await deadline.run(
+                "users.restore.insert", lambda: self.collection.insert_one(user_doc)
+            )
+        except DuplicateKeyError:
+            # Restored concurrently by another request: use that copy
+            user_doc = await deadline.run(
+                "users.restore.find_hot", lambda: self.collection.find_one(query)
+            )
+            if user_doc is None:
+                return None
+        await deadline.run(
+            "users.restore.delete",
+            lambda: self.archive.delete_one({"_id": user_doc["_id"]}),
+        )
+        
+        USERS_RESTORED_TOTAL.inc()
+        USER_RESTORE_SECONDS.observe(time.perf_counter() - started)
+        logger.info("Archived user restored", user_id=str(user_doc["_id"]))
+        return user_doc
+    
+    async def _record_login(self, user_doc: Dict[str, Any]) -> None:
+        """Update ``last_login_at``, at most once per ``LAST_LOGIN_RESOLUTION``."""
+        now = datetime.utcnow()
+        last_login = user_doc.get("last_login_at")
+        resolution = settings.LAST_LOGIN_RESOLUTION
+        if last_login and (now - last_login).total_seconds() < resolution:
+            return
+        await deadline.run(
+            "users.record_login",
+            lambda: self.collection.update_one(
+                {"_id": user_doc["_id"]}, {"$set": {"last_login_at": now}}
+            ),
+        )
+    
     async def delete(self, user_id: str) -> bool:
         """Delete user."""
         try:
             from bson import ObjectId
-            result = await self.collection.delete_one({"_id": ObjectId(user_id)})
+            result = await deadline.run(
+                "users.delete",
+                lambda: self.collection.delete_one({"_id": ObjectId(user_id)}),
+            )
+            if result.deleted_count == 0:
+                # Archived users must go too, or a login would restore them
+                result = await deadline.run(
+                    "users.delete_archived",
+                    lambda: self.archive.delete_one({"_id": ObjectId(user_id)}),
+                )
             return result.deleted_count > 0
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
         except Exception as e:
             logger.error("Error deleting user", user_id=user_id, error=str(e))
             return False
@@ -116,7 +587,7 @@ class UserService:
     async def authenticate(self, email: str, password: str) -> Optional[User]:
         """Authenticate user."""
         try:
-            user_doc = await self.collection.find_one({"email": email})
+            user_doc = await self._find_by_email("users.authenticate", email)
             if not user_doc:
                 return None
             
@@ -124,8 +595,68 @@ class UserService:
             if not verify_password(password, user_in_db.hashed_password):
                 return None
             
+            await self._record_login(user_doc)
+            
             # Return user without password
             return User(**user_doc)
+        except (DeadlineExceeded, DatabaseUnavailable):
+            raise
         except Exception as e:
             logger.error("Error authenticating user", email=email, error=str(e))
             return None
+    
+    async def get_in_db_by_email(self, email: str) -> Optional[UserInDB]:
+        """Get user by email, including the password hash."""
+        user_doc = await self._find_by_email("users.get_in_db_by_email", email)
+        if user_doc:
+            return UserInDB(**user_doc)
+        return None
+    
+    async def mark_email_verified(self, user_id: str) -> bool:
+        """Record that the user confirmed their email address."""
+        from bson import ObjectId
+        result: UpdateResult = await deadline.run(
+            "users.mark_email_verified",
+            lambda: self.collection.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": {"email_verified": True, "updated_at": datetime.utcnow()}},
+            ),
+        )
+        return result.matched_count > 0
+    
+    async def reset_password(
+        self, user_id: str, fingerprint: str, new_password: str
+    ) -> bool:
+        """Set a new password if the current one still matches ``fingerprint``.
+        
+        The fingerprint comes from the reset token, so a token stops working
+        once the password has changed, including through its own use.
+        """
+        from bson import ObjectId
+        user_doc = await deadline.run(
+            "users.get_for_reset",
+            lambda: self.collection.find_one({"_id": ObjectId(user_id)}),
+        )
+        if not user_doc:
+            return False
+        if password_fingerprint(user_doc["hashed_password"]) != fingerprint:
+            return False
+        
+        hashed_password = get_password_hash(new_password)
+        result: UpdateResult = await deadline.run(
+            "users.reset_password",
+            lambda: self.collection.update_one(
+                # Only if no concurrent reset got there first
+                {
+                    "_id": user_doc["_id"],
+                    "hashed_password": user_doc["hashed_password"],
+                },
+                {
+                    "$set": {
+                        "hashed_password": hashed_password,
+                        "updated_at": datetime.utcnow(),
+                    }
+                },
+            ),
+        )
+        return result.modified_count > 0
@@ -0,0 +1,47 @@
+"""Periodic maintenance tasks."""
+
+import os
+import time
+from typing import Any, Dict
+
+from app.core.celery import task
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.file_service import temp_dir
+from app.tasks.users import export_dir
+
+logger = get_logger(__name__)
+
+
+@task(name="app.tasks.maintenance.cleanup_exports")
+def cleanup_exports() -> Dict[str, Any]:
+    """Remove export files older than the retention period."""
+    directory = export_dir()
+    if not os.path.isdir(directory):
+        return {"removed": 0}
+
+    cutoff = time.time() - settings.EXPORT_RETENTION_HOURS * 3600
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    logger.info("Expired exports removed", removed=removed)
+    return {"removed": removed}
+
+
+@task(name="app.tasks.maintenance.cleanup_partial_uploads")
+def cleanup_partial_uploads() -> Dict[str, Any]:
+    """Remove partial uploads and half-deleted blobs left by crashed workers."""
+    directory = temp_dir()
+    if not os.path.isdir(directory):
+        return {"removed": 0}
+
+    cutoff = time.time() - settings.UPLOAD_TEMP_RETENTION_HOURS * 3600
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    logger.info("Partial uploads removed", removed=removed)
+    return {"removed": removed}
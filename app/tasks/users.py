@@ -0,0 +1,122 @@
+"""User background tasks."""
+
+import csv
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from app.core.celery import run_async, task
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.user import UserFilter
+from app.services.user_service import UserService
+
+logger = get_logger(__name__)
+
+EXPORT_FIELDS = ["id", "email", "full_name", "is_active", "is_superuser", "created_at"]
+
+
+def export_dir() -> str:
+    """Directory holding generated exports (shared with the API)."""
+    return os.path.join(settings.UPLOAD_DIR, "exports")
+
+
+def export_path(task_id: str) -> str:
+    """Path of the export file produced by a task."""
+    return os.path.join(export_dir(), f"users-{task_id}.csv")
+
+
+def bulk_query(filter_data: Dict[str, Any], exclude_ids: List[str]) -> Dict[str, Any]:
+    """Build the query for a bulk action, leaving out ``exclude_ids``."""
+    query = UserFilter(**filter_data).to_query()
+    if exclude_ids:
+        excluded = [ObjectId(user_id) for user_id in exclude_ids]
+        query = {"$and": [query, {"_id": {"$nin": excluded}}]}
+    return query
+
+
+@task(bind=True, name="app.tasks.users.bulk_user_action")
+def bulk_user_action(
+    self: Any,
+    filter_data: Dict[str, Any],
+    action: str,
+    exclude_ids: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Activate, deactivate or delete every user matching a filter."""
+    query = bulk_query(filter_data, exclude_ids or [])
+
+    async def _run() -> Dict[str, int]:
+        service = UserService()
+        total = await service.count(query)
+
+        def report(processed: int) -> None:
+            self.update_state(
+                state="PROGRESS", meta={"processed": processed, "total": total}
+            )
+
+        changed = await service.bulk_apply(
+            query, action, chunk_size=settings.BULK_CHUNK_SIZE, progress=report
+        )
+        return {"matched": total, "changed": changed}
+
+    result = run_async(_run)
+    logger.info("Bulk user action finished", action=action, **result)
+    return dict(result, action=action)
+
+
+@task(bind=True, name="app.tasks.users.export_users")
+def export_users(self: Any) -> Dict[str, Any]:
+    """Export all users to a CSV file, reporting progress as it goes."""
+    path = export_path(self.request.id)
+    os.makedirs(export_dir(), exist_ok=True)
+
+    async def _run() -> int:
+        count = 0
+        with open(path + ".part", "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(EXPORT_FIELDS)
+            async for user in UserService().iter_all():
+                writer.writerow(
+                    [
+                        str(user.id),
+                        user.email,
+                        user.full_name,
+                        user.is_active,
+                        user.is_superuser,
+                        user.created_at.isoformat(),
+                    ]
+                )
+                count += 1
+                if count % 1000 == 0:
+                    self.update_state(state="PROGRESS", meta={"processed": count})
+        os.replace(path + ".part", path)
+        return count
+
+    count = run_async(_run)
+    logger.info("User export finished", count=count, path=path)
+    return {"count": count, "file": os.path.basename(path)}
+
+
+@task(bind=True, name="app.tasks.users.archive_inactive_users")
+def archive_inactive_users(self: Any) -> Dict[str, Any]:
+    """Move long-inactive users to the archive collection in throttled batches."""
+    if not settings.ARCHIVE_ENABLED:
+        return {"archived": 0, "enabled": False}
+    cutoff = datetime.utcnow() - timedelta(days=settings.ARCHIVE_INACTIVE_DAYS)
+
+    def report(archived: int) -> None:
+        self.update_state(state="PROGRESS", meta={"archived": archived})
+
+    async def _run() -> int:
+        return await UserService().archive_inactive(
+            cutoff,
+            batch_size=settings.ARCHIVE_BATCH_SIZE,
+            pause=settings.ARCHIVE_BATCH_PAUSE,
+            progress=report,
+        )
+
+    archived = run_async(_run)
+    logger.info("Inactive user archival finished", archived=archived)
+    return {"archived": archived, "enabled": True}
@@ -0,0 +1,15 @@
+"""Text helpers."""
+
+import unicodedata
+
+
+def normalize_search_text(value: str) -> str:
+    """Normalize text for prefix search.
+
+    Accents are stripped, case is folded and runs of whitespace collapse to
+    single spaces, so "  José  Álvarez" is stored and queried as
+    "jose alvarez".
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
@@ -60,6 +60,17 @@ db.createCollection('users', {
 db.users.createIndex({ 'email': 1 }, { unique: true });
 db.users.createIndex({ 'created_at': 1 });
 db.users.createIndex({ 'is_active': 1 });
+db.users.createIndex({ 'search_name': 1, '_id': 1 });
+db.users.createIndex({ 'search_email': 1, '_id': 1 });
+
+// Long-inactive users are moved here and restored on their next login
+db.createCollection('users_archive');
+db.users_archive.createIndex({ 'email': 1 });
+
+// Uploaded file metadata; the content lives in UPLOAD_DIR/blobs
+db.createCollection('files');
+db.files.createIndex({ 'owner_id': 1, '_id': -1 });
+db.files.createIndex({ 'sha256': 1 });
 
 // Create other collections
 db.createCollection('sessions');
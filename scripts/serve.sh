@@ -0,0 +1,14 @@
+#!/bin/sh
+
+# Start the API in the Docker image, aggregating Prometheus metrics
+# across worker processes. Extra arguments go to uvicorn.
+
+set -e
+
+# Metric files left by a previous run of the container would be read as
+# live workers once their pids are reused, so start from an empty directory
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+find "$PROMETHEUS_MULTIPROC_DIR" -mindepth 1 -delete
+
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 "$@"
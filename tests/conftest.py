@@ -1,13 +1,16 @@
 """Test configuration and fixtures."""
 
 import asyncio
+
 import pytest
 from httpx import AsyncClient
+from mongomock_motor import AsyncMongoMockClient
 from motor.motor_asyncio import AsyncIOMotorClient
 
-from app.main import app
 from app.core.config import settings
+from app.db import mongodb
 from app.db.mongodb import get_database
+from app.main import app
 
 
 @pytest.fixture(scope="session")
@@ -36,6 +39,14 @@ async def test_db():
     client.close()
 
 
+@pytest.fixture
+def database(monkeypatch):
+    """In-memory stand-in for MongoDB, installed as the application database."""
+    database = AsyncMongoMockClient()["marslanding_test"]
+    monkeypatch.setattr(mongodb, "database", database)
+    return database
+
+
 @pytest.fixture
 def override_get_db(test_db):
     """Override database dependency."""
@@ -0,0 +1,95 @@
+"""Test the user change feed against a real replica set.
+
+Change streams need a replica set. Start a local single-node one with::
+
+    docker run -d -p 27017:27017 mongo:7.0 --replSet rs0
+    docker exec <container> mongosh --eval "rs.initiate()"
+
+and set ``TEST_REPLICA_SET_URL=mongodb://localhost:27017/?replicaSet=rs0``.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.changefeed import ChangeFeed
+from app.db import mongodb
+from app.services.user_service import user_change
+
+REPLICA_SET_URL = os.environ.get("TEST_REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(
+    not REPLICA_SET_URL, reason="TEST_REPLICA_SET_URL is not set"
+)
+
+
+async def _next_event(stream) -> tuple:
+    while True:
+        message = (await asyncio.wait_for(stream.__anext__(), 10)).decode()
+        if message.startswith("id: "):
+            lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+            return lines["id"], lines["event"], json.loads(lines["data"])
+
+
+async def _run() -> None:
+    client = AsyncIOMotorClient(REPLICA_SET_URL)
+    previous = mongodb.database
+    mongodb.database = client["marslanding_change_feed_test"]
+    feed = ChangeFeed("users", user_change)
+    users = mongodb.database["users"]
+    try:
+        stream = feed.stream()
+        await stream.__anext__()  # retry hint, subscribes and starts the watcher
+        await asyncio.sleep(1)  # let the change stream open
+
+        now = datetime.utcnow()
+        result = await users.insert_one(
+            {
+                "email": "feed@example.com",
+                "full_name": "Feed User",
+                "hashed_password": "secret-hash",
+                "is_active": True,
+                "is_superuser": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        first_id, event, data = await _next_event(stream)
+        assert event == "insert"
+        assert data["id"] == str(result.inserted_id)
+        assert data["fields"]["full_name"] == "Feed User"
+        assert "hashed_password" not in data["fields"]
+
+        await users.update_one(
+            {"_id": result.inserted_id}, {"$set": {"hashed_password": "new-hash"}}
+        )
+        await users.update_one(
+            {"_id": result.inserted_id}, {"$set": {"is_active": False}}
+        )
+        await users.delete_one({"_id": result.inserted_id})
+        events = [(await _next_event(stream))[1:] for _ in range(3)]
+        assert [event for event, _ in events] == ["update", "update", "delete"]
+        assert events[0][1]["fields"] == {}
+        assert events[1][1]["fields"] == {"is_active": False}
+        await stream.aclose()
+
+        # A reconnect with the first id replays everything after it
+        resumed = feed.stream(first_id)
+        await resumed.__anext__()
+        replayed = [(await _next_event(resumed))[1] for _ in range(3)]
+        assert replayed == ["update", "update", "delete"]
+        await resumed.aclose()
+    finally:
+        await feed.close()
+        mongodb.database = previous
+        await client.drop_database("marslanding_change_feed_test")
+        client.close()
+
+
+def test_user_change_feed_streams_and_resumes():
+    """Test that inserts, updates and deletes stream and replay on reconnect."""
+    asyncio.run(_run())
@@ -0,0 +1,414 @@
+"""End-to-end load benchmark.
+
+Drives a mixed workload (login, ``/users/me``, ``GET /users`` pagination,
+user create and update) against the app and reports requests per second
+and p50/p95/p99 latency per operation. The database is an in-memory
+mongomock stand-in, seeded with deterministic users, so runs need neither
+MongoDB nor the network.
+
+Usage::
+
+    python -m tests.performance.load                  # in-process (ASGI)
+    python -m tests.performance.load --uvicorn        # local uvicorn server
+    python -m tests.performance.load --update-baseline
+
+Admission control and the database circuit breaker are switched off, so
+every request is served and runs are comparable. The regression check
+compares a run with the baseline of the same runner, kept as
+``baselines/load-<runner>.json``. Absolute numbers only mean something on
+the machine that measured them, so each runner (``BENCH_RUNNER``, by
+default a fingerprint of OS, architecture, CPU count and Python version)
+records its own baseline with ``--update-baseline``, from a run without
+errors, and the check is skipped on runners that have none.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+from bson import ObjectId
+
+BASELINE_DIR = Path(__file__).with_name("baselines")
+BENCH_SECRET_KEY = "benchmark-secret-key"
+BENCH_PASSWORD = "benchmark-password"
+API = "/api/v1"
+
+# Load shedding would turn the benchmark into a measure of where the
+# adaptive limits happened to settle, so it measures the app without it
+BENCH_SETTINGS = {"ADMISSION_CONTROL_ENABLED": False, "MONGODB_BREAKER_ENABLED": False}
+
+
+@dataclass
+class WorkloadConfig:
+    """Load benchmark parameters."""
+
+    requests: int = 500
+    concurrency: int = 16
+    seed_users: int = 1000
+    page_size: int = 50
+    random_seed: int = 42
+    weights: Dict[str, int] = field(
+        default_factory=lambda: {
+            "login": 4,
+            "me": 50,
+            "list": 20,
+            "create": 6,
+            "update": 20,
+        }
+    )
+
+
+def user_id(index: int) -> ObjectId:
+    """Deterministic ObjectId of seeded user ``index``."""
+    return ObjectId(f"{index + 1:024x}")
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.example.com"
+
+
+async def seed_users(database: Any, count: int) -> None:
+    """Seed ``count`` users (user 0 is a superuser) sharing one password."""
+    from app.core.security import get_password_hash
+
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    await database["users"].delete_many({})
+    await database["users"].insert_many(
+        [
+            {
+                "_id": user_id(i),
+                "email": user_email(i),
+                "full_name": f"Bench User {i}",
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "is_superuser": i == 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count)
+        ]
+    )
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+class Workload:
+    """Mixed workload issuing requests through an httpx client."""
+
+    def __init__(self, client: httpx.AsyncClient, config: WorkloadConfig):
+        from app.core.security import create_access_token
+
+        self.client = client
+        self.config = config
+        self.random = random.Random(config.random_seed)
+        self.tokens = [
+            create_access_token(str(user_id(i))) for i in range(config.seed_users)
+        ]
+        self.created = 0
+        self.latencies: Dict[str, List[float]] = {op: [] for op in config.weights}
+        self.errors: Dict[str, int] = {op: 0 for op in config.weights}
+        self.statuses: Dict[str, int] = {}
+
+    def _auth(self, index: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[index]}"}
+
+    async def _request(self, op: str) -> httpx.Response:
+        index = self.random.randrange(1, self.config.seed_users)
+        if op == "login":
+            return await self.client.post(
+                f"{API}/auth/login",
+                data={"username": user_email(index), "password": BENCH_PASSWORD},
+            )
+        if op == "me":
+            return await self.client.get(f"{API}/users/me", headers=self._auth(index))
+        if op == "list":
+            skip = self.random.randrange(0, self.config.seed_users)
+            return await self.client.get(
+                f"{API}/users/",
+                params={"skip": skip, "limit": self.config.page_size},
+                headers=self._auth(0),
+            )
+        if op == "create":
+            self.created += 1
+            return await self.client.post(
+                f"{API}/users/",
+                json={
+                    "email": f"new{self.created}-{time.time_ns()}@bench.example.com",
+                    "full_name": "New Bench User",
+                    "password": BENCH_PASSWORD,
+                },
+            )
+        return await self.client.put(
+            f"{API}/users/me",
+            json={"full_name": f"Renamed {self.random.random()}"},
+            headers=self._auth(index),
+        )
+
+    async def _worker(self, queue: "asyncio.Queue[str]") -> None:
+        while True:
+            try:
+                op = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await self._request(op)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            ok = status.isdigit() and int(status) < 400
+            self.latencies[op].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[op] += 1
+
+    async def run(self) -> Dict[str, Any]:
+        ops = list(self.config.weights)
+        plan = self.random.choices(
+            ops, weights=[self.config.weights[op] for op in ops], k=self.config.requests
+        )
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for op in plan:
+            queue.put_nowait(op)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(self._worker(queue) for _ in range(self.config.concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+        everything = [value for values in self.latencies.values() for value in values]
+        return {
+            "runner": runner_name(),
+            "config": asdict(self.config),
+            "elapsed_s": round(elapsed, 3),
+            "total": summarize(everything, sum(self.errors.values()), elapsed),
+            "statuses": self.statuses,
+            "operations": {
+                op: summarize(self.latencies[op], self.errors[op], elapsed)
+                for op in ops
+            },
+        }
+
+
+async def run_in_process(config: WorkloadConfig) -> Dict[str, Any]:
+    """Run the workload against the ASGI app in this process."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    from app.core.config import settings
+    from app.db import mongodb
+
+    settings.SECRET_KEY = BENCH_SECRET_KEY
+    previous = mongodb.database
+    previous_settings = {key: getattr(settings, key) for key in BENCH_SETTINGS}
+    for key, value in BENCH_SETTINGS.items():
+        setattr(settings, key, value)
+    mongodb.database = AsyncMongoMockClient()[settings.MONGODB_DATABASE]
+    try:
+        await seed_users(mongodb.database, config.seed_users)
+        from app.main import create_application
+
+        # Middleware is chosen when the app is built, so build one here
+        app = create_application()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://localhost"
+        ) as client:
+            return await Workload(client, config).run()
+    finally:
+        mongodb.database = previous
+        for key, value in previous_settings.items():
+            setattr(settings, key, value)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(config: WorkloadConfig) -> Dict[str, Any]:
+    """Run the workload against a local uvicorn server on a stand-in DB."""
+    from app.core.config import settings
+
+    settings.SECRET_KEY = BENCH_SECRET_KEY
+    port = _free_port()
+    env = dict(
+        os.environ,
+        SECRET_KEY=BENCH_SECRET_KEY,
+        **{key: str(value).lower() for key, value in BENCH_SETTINGS.items()},
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tests.performance.server",
+            "--port",
+            str(port),
+            "--users",
+            str(config.seed_users),
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            timeout=60,
+            limits=httpx.Limits(max_connections=config.concurrency),
+        ) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Benchmark server did not start")
+            return await Workload(client, config).run()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def runner_name() -> str:
+    """Name of the environment a baseline belongs to."""
+    name = os.environ.get("BENCH_RUNNER")
+    if name:
+        return name
+    system, machine = platform.system(), platform.machine()
+    version = "{}.{}".format(*sys.version_info[:2])
+    return f"{system}-{machine}-{os.cpu_count()}cpu-py{version}".lower()
+
+
+def baseline_path(runner: Optional[str] = None) -> Path:
+    return BASELINE_DIR / f"load-{runner or runner_name()}.json"
+
+
+def load_baseline(runner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    path = baseline_path(runner)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """List regressions of ``report`` against ``baseline`` beyond tolerance."""
+    failures = []
+    if report["total"]["rps"] < baseline["total"]["rps"] * (1 - tolerance):
+        failures.append(
+            f"throughput {report['total']['rps']} rps < baseline "
+            f"{baseline['total']['rps']} rps (-{tolerance:.0%})"
+        )
+    for op, base in baseline["operations"].items():
+        current = report["operations"].get(op)
+        if current is None or not base["count"]:
+            continue
+        error_rate = current["errors"] / max(current["count"], 1)
+        base_error_rate = base["errors"] / base["count"]
+        if error_rate > base_error_rate + 0.01:
+            failures.append(
+                f"{op}: error rate {error_rate:.1%} (baseline {base_error_rate:.1%})"
+            )
+        for metric in ("p95_ms", "p99_ms"):
+            limit = base[metric] * (1 + tolerance)
+            if current[metric] > limit:
+                failures.append(
+                    f"{op}: {metric} {current[metric]} > {round(limit, 3)} "
+                    f"(baseline {base[metric]}, +{tolerance:.0%})"
+                )
+    return failures
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{'operation':<10}{'count':>8}{'errors':>8}{'rps':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    rows = dict(report["operations"], total=report["total"])
+    for op, stats in rows.items():
+        lines.append(
+            f"{op:<10}{stats['count']:>8}{stats['errors']:>8}{stats['rps']:>10}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=WorkloadConfig.requests)
+    parser.add_argument("--concurrency", type=int, default=WorkloadConfig.concurrency)
+    parser.add_argument("--users", type=int, default=WorkloadConfig.seed_users)
+    parser.add_argument("--uvicorn", action="store_true", help="drive a local uvicorn")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    config = WorkloadConfig(
+        requests=args.requests, concurrency=args.concurrency, seed_users=args.users
+    )
+    runner = run_uvicorn if args.uvicorn else run_in_process
+    report = asyncio.run(runner(config))
+    print(format_report(report))
+    print(f"statuses: {report['statuses']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.update_baseline:
+        if report["total"]["errors"]:
+            sys.exit("Not updating the baseline from a run with errors")
+        path = baseline_path()
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {path}")
+        return
+
+    baseline = load_baseline()
+    if baseline is None:
+        print(f"No baseline for runner {runner_name()}, skipping regression check")
+        return
+    failures = compare(report, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
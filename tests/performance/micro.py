@@ -0,0 +1,119 @@
+"""Micro-benchmark helpers for function-level hot paths.
+
+Each benchmark reports operations per second and allocation figures from
+``tracemalloc``. Timings are taken with tracing off, and allocations in a
+separate traced run:
+
+* ``alloc_peak_bytes`` - peak traced memory during a single call
+* ``alloc_blocks`` - memory blocks still allocated after a call, averaged
+
+Results are written as JSON. Compare two runs with::
+
+    python -m tests.performance.micro compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+RESULTS_PATH = Path(
+    os.environ.get("MICROBENCH_OUTPUT", ".benchmarks/micro_latest.json")
+)
+
+
+def _time_loop(func: Callable[[], Any], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def measure(
+    func: Callable[[], Any],
+    *,
+    rounds: int = 5,
+    min_round_time: float = 0.05,
+    alloc_calls: int = 20,
+) -> Dict[str, Any]:
+    """Benchmark ``func`` and return ops/sec and allocation figures."""
+    func()  # warm up caches, lazy imports and schema builds
+
+    number = 1
+    while _time_loop(func, number) < min_round_time:
+        number *= 2
+    timings = [_time_loop(func, number) / number for _ in range(rounds)]
+
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks_before = sys.getallocatedblocks()
+        for _ in range(alloc_calls):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        blocks = (sys.getallocatedblocks() - blocks_before) / alloc_calls
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "ops_per_sec": round(1 / best, 1),
+        "mean_us": round(statistics.mean(timings) * 1e6, 3),
+        "best_us": round(best * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(timings) * 1e6, 3),
+        "calls_per_round": number,
+        "alloc_peak_bytes": max(peaks),
+        "alloc_blocks": round(blocks, 2),
+    }
+
+
+def write_results(
+    results: Dict[str, Dict[str, Any]], path: Path = RESULTS_PATH
+) -> None:
+    """Write benchmark results with enough context to compare runs."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+def compare(old_path: Path, new_path: Path) -> str:
+    """Render the ops/sec change of every benchmark between two runs."""
+    old = json.loads(old_path.read_text())["benchmarks"]
+    new = json.loads(new_path.read_text())["benchmarks"]
+    lines = [f"{'benchmark':<52}{'old ops/s':>14}{'new ops/s':>14}{'change':>10}"]
+    for name in sorted(set(old) | set(new)):
+        if name not in old or name not in new:
+            lines.append(f"{name:<52}{'(only in one run)':>38}")
+            continue
+        before, after = old[name]["ops_per_sec"], new[name]["ops_per_sec"]
+        change = (after - before) / before * 100
+        lines.append(f"{name:<52}{before:>14}{after:>14}{change:>+9.1f}%")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare micro-benchmark runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    args = parser.parse_args()
+    print(compare(args.old, args.new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Local uvicorn server on a seeded in-memory database, for load benchmarks."""
+
+import argparse
+import asyncio
+
+import uvicorn
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.db import mongodb
+from tests.performance.load import seed_users
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    mongodb.database = AsyncMongoMockClient()[settings.MONGODB_DATABASE]
+    asyncio.run(seed_users(mongodb.database, args.users))
+
+    from app.main import app
+
+    # The lifespan would connect to a real MongoDB, so it is disabled
+    uvicorn.run(
+        app, host="127.0.0.1", port=args.port, lifespan="off", log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
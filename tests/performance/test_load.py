@@ -0,0 +1,39 @@
+"""Load benchmark regression check (run with ``pytest -m benchmark``)."""
+
+import asyncio
+import os
+
+import pytest
+
+from tests.performance.load import (
+    WorkloadConfig,
+    compare,
+    format_report,
+    load_baseline,
+    run_in_process,
+    runner_name,
+)
+
+
+@pytest.mark.benchmark
+def test_load_regression():
+    """Test that throughput and tail latency stay within this runner's baseline."""
+    baseline = load_baseline()
+    if baseline is None:
+        pytest.skip(
+            f"No load baseline for runner {runner_name()}, "
+            "run python -m tests.performance.load --update-baseline"
+        )
+
+    config = WorkloadConfig(
+        **{
+            key: baseline["config"][key]
+            for key in ("requests", "concurrency", "seed_users", "page_size")
+        }
+    )
+    report = asyncio.run(run_in_process(config))
+    print(format_report(report))
+
+    tolerance = float(os.environ.get("BENCH_TOLERANCE", "0.25"))
+    failures = compare(report, baseline, tolerance)
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,91 @@
+"""Micro-benchmarks for security, model and serialization hot paths.
+
+CPU only, no MongoDB. Run with ``pytest -m benchmark tests/performance``.
+"""
+
+from datetime import datetime
+from typing import List
+
+import pytest
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    verify_password,
+    verify_token,
+)
+from app.models.user import PyObjectId, User, UserInDB
+from app.schemas.common import ResponseModel
+from tests.performance.micro import measure, write_results
+
+PASSWORD = "benchmark-password"
+
+
+def _user_doc() -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "email": "bench@example.com",
+        "full_name": "Bench User",
+        "hashed_password": get_password_hash(PASSWORD),
+        "is_active": True,
+        "is_superuser": False,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+USER_DOC = _user_doc()
+USER_ID = str(USER_DOC["_id"])
+TOKEN = create_access_token(USER_ID)
+PAGE = [User(**dict(USER_DOC, _id=ObjectId())) for _ in range(100)]
+PAGE_RESPONSE = ResponseModel[List[User]](data=PAGE)
+PAGE_ADAPTER = TypeAdapter(ResponseModel[List[User]])
+
+BENCHMARKS = {
+    "security.create_access_token": (lambda: create_access_token(USER_ID), {}),
+    "security.verify_token": (lambda: verify_token(TOKEN), {}),
+    "security.get_password_hash": (
+        lambda: get_password_hash(PASSWORD),
+        {"rounds": 3, "alloc_calls": 2},
+    ),
+    "security.verify_password": (
+        lambda: verify_password(PASSWORD, USER_DOC["hashed_password"]),
+        {"rounds": 3, "alloc_calls": 2},
+    ),
+    "models.PyObjectId.validate": (lambda: PyObjectId.validate(USER_ID), {}),
+    "models.User(**doc)": (lambda: User(**USER_DOC), {}),
+    "models.UserInDB(**doc)": (lambda: UserInDB(**USER_DOC), {}),
+    # What FastAPI does with a returned model: dump, re-validate, serialize
+    "schemas.ResponseModel[List[User]].response[100]": (
+        lambda: PAGE_ADAPTER.dump_json(
+            PAGE_ADAPTER.validate_python(PAGE_RESPONSE.model_dump(by_alias=True))
+        ),
+        {},
+    ),
+    "schemas.ResponseModel[List[User]].dump_json[100]": (
+        lambda: PAGE_RESPONSE.model_dump_json(),
+        {},
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Collect results and write them as JSON once all benchmarks ran."""
+    collected: dict = {}
+    yield collected
+    write_results(collected)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_micro_benchmark(name, results):
+    """Measure one hot path in isolation."""
+    func, options = BENCHMARKS[name]
+    stats = measure(func, **options)
+    results[name] = stats
+    print(f"\n{name}: {stats['ops_per_sec']} ops/s, {stats['alloc_peak_bytes']} B peak")
+    assert stats["ops_per_sec"] > 0
@@ -0,0 +1,114 @@
+"""User search latency at scale (run with ``pytest -m benchmark``).
+
+Needs a real MongoDB, since the point is to check index use: set
+``BENCH_MONGODB_URL`` (for example ``mongodb://localhost:27017``). The
+benchmark seeds ``BENCH_SEARCH_USERS`` users (default 1,000,000) into a
+scratch database and drops it afterwards.
+"""
+
+import asyncio
+import os
+import random
+import string
+import time
+from datetime import datetime
+
+import pytest
+
+from tests.performance.load import percentile
+
+MONGODB_URL = os.environ.get("BENCH_MONGODB_URL")
+USERS = int(os.environ.get("BENCH_SEARCH_USERS", "1000000"))
+P99_LIMIT_MS = float(os.environ.get("BENCH_SEARCH_P99_MS", "50"))
+QUERIES = 500
+LIMIT = 10
+
+
+def _name(rng: random.Random) -> str:
+    def word() -> str:
+        return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+    return f"{word().title()} {word().title()}"
+
+
+async def _seed(collection, count: int) -> None:
+    from app.services.user_service import search_fields
+
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        doc = {
+            "email": f"user{i}@search.example.com",
+            "full_name": _name(rng),
+            "hashed_password": "x",
+            "is_active": True,
+            "is_superuser": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        doc.update(search_fields(doc))
+        batch.append(doc)
+        if len(batch) == 10000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def _run() -> dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.db import mongodb
+    from app.services.user_service import UserService
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    database = client["marslanding_search_bench"]
+    previous = mongodb.database
+    mongodb.database = database
+    try:
+        await database.drop_collection("users")
+        await _seed(database["users"], USERS)
+        await mongodb.create_indexes()
+
+        service = UserService()
+        rng = random.Random(11)
+        prefixes = [
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 3)))
+            for _ in range(QUERIES)
+        ]
+        latencies = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            await service.search(prefix, limit=LIMIT)
+            latencies.append(time.perf_counter() - started)
+
+        plan = (
+            await database["users"]
+            .find({"search_name": {"$gte": "a", "$lt": "a\U0010ffff"}})
+            .sort([("search_name", 1), ("_id", 1)])
+            .limit(LIMIT + 1)
+            .explain()
+        )
+        return {"latencies": sorted(latencies), "plan": plan}
+    finally:
+        mongodb.database = previous
+        await client.drop_database("marslanding_search_bench")
+        client.close()
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(not MONGODB_URL, reason="BENCH_MONGODB_URL is not set")
+def test_search_typeahead_latency():
+    """Test that typeahead stays an index range scan with bounded latency."""
+    result = asyncio.run(_run())
+    latencies = result["latencies"]
+    p50, p95, p99 = (percentile(latencies, pct) * 1000 for pct in (50, 95, 99))
+    print(
+        f"search over {USERS} users: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms"
+    )
+
+    stats = result["plan"]["executionStats"]
+    assert "IXSCAN" in str(result["plan"]["queryPlanner"]["winningPlan"])
+    assert stats["totalDocsExamined"] <= LIMIT + 1
+    assert p99 <= P99_LIMIT_MS
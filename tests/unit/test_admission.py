@@ -0,0 +1,66 @@
+"""Test adaptive admission control."""
+
+import asyncio
+
+import pytest
+
+from app.core.admission import AdaptiveLimiter, classify
+
+
+def _limiter(**overrides) -> AdaptiveLimiter:
+    options = {
+        "name": "test",
+        "max_limit": 2,
+        "min_limit": 1,
+        "target_latency": 0.1,
+        "queue_size": 1,
+        "queue_timeout": 0.05,
+    }
+    options.update(overrides)
+    return AdaptiveLimiter(**options)
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_sheds():
+    """Test that excess requests queue briefly and overflow is shed."""
+    limiter = _limiter()
+    assert await limiter.acquire()
+    assert await limiter.acquire()
+
+    queued = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not await limiter.acquire()  # queue is full
+
+    limiter.release(0.01)
+    assert await queued
+    assert limiter.inflight == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_times_out_queued_request():
+    """Test that a queued request is shed after the queue timeout."""
+    limiter = _limiter(max_limit=1)
+    assert await limiter.acquire()
+    assert not await limiter.acquire()
+    assert limiter.inflight == 1
+    assert not limiter._waiters
+
+
+def test_limiter_adapts_to_latency():
+    """Test that slow requests shrink the limit and fast ones grow it."""
+    limiter = _limiter(max_limit=10, min_limit=2)
+    limiter.inflight = 2
+    limiter.release(1.0)
+    assert limiter.limit == pytest.approx(9.0)
+
+    limiter.release(0.01)
+    assert 9.0 < limiter.limit <= 10
+
+
+def test_health_and_metrics_are_never_classified():
+    """Test that health and metrics bypass admission control."""
+    assert classify({"path": "/health", "method": "GET"}) is None
+    assert classify({"path": "/metrics/", "method": "GET"}) is None
+    assert classify({"path": "/api/v1/auth/login", "method": "POST"}) == "auth"
+    assert classify({"path": "/api/v1/users/me", "method": "GET"}) == "read"
+    assert classify({"path": "/api/v1/users/", "method": "POST"}) == "write"
@@ -0,0 +1,92 @@
+"""Test change feed fan-out."""
+
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+from app.core.changefeed import DROPPED, RESET, ChangeFeed
+from app.services.user_service import user_change
+
+
+def _change(index: int, operation: str = "update") -> dict:
+    return {
+        "_id": {"_data": f"token-{index}"},
+        "operationType": operation,
+        "documentKey": {"_id": ObjectId(f"{index + 1:024x}")},
+        "updateDescription": {
+            "updatedFields": {"full_name": f"User {index}", "hashed_password": "x"},
+            "removedFields": [],
+        },
+    }
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """Change feed whose watcher never starts."""
+    monkeypatch.setattr(ChangeFeed, "_start", lambda self: None)
+    feed = ChangeFeed("users", user_change)
+    feed.queue_size = 2
+    return feed
+
+
+def _data(message: bytes) -> dict:
+    return json.loads(message.decode().split("data: ", 1)[1])
+
+
+@pytest.mark.asyncio
+async def test_publish_fans_out_to_every_subscriber(feed):
+    """Test that each subscriber receives each event."""
+    first, second = feed.subscribe(), feed.subscribe()
+
+    feed.publish(_change(0))
+
+    for subscription in (first, second):
+        message = subscription.queue.get_nowait()
+        assert message.startswith(b"id: token-0\nevent: update\n")
+        assert _data(message)["fields"] == {"full_name": "User 0"}
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped(feed):
+    """Test that a subscriber with a full queue is dropped, others are not."""
+    slow, fast = feed.subscribe(), feed.subscribe()
+
+    for index in range(3):
+        feed.publish(_change(index))
+        fast.queue.get_nowait()
+
+    assert slow.queue.get_nowait() is None
+    assert slow not in feed._subscribers
+    assert fast in feed._subscribers
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_replays_missed_events(feed):
+    """Test that Last-Event-ID replays events after it, or resets if unknown."""
+    for index in range(3):
+        feed.publish(_change(index))
+
+    resumed = feed.subscribe("token-0")
+    unknown = feed.subscribe("token-expired")
+
+    assert [_data(message)["fields"]["full_name"] for message in resumed.backlog] == [
+        "User 1",
+        "User 2",
+    ]
+    assert unknown.backlog == [RESET]
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_when_dropped(feed):
+    """Test that a dropped client's stream ends with a dropped event."""
+    stream = feed.stream()
+    await stream.__anext__()  # retry hint
+    subscription = next(iter(feed._subscribers))
+    subscription.end()
+
+    assert await asyncio.wait_for(stream.__anext__(), 1) == DROPPED
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert not feed._subscribers
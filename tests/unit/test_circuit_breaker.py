@@ -0,0 +1,117 @@
+"""Test the MongoDB circuit breaker."""
+
+import asyncio
+
+import httpx
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+from app.core.security import create_access_token
+from app.db import mongodb
+from app.db.mongodb import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DatabaseUnavailable
+
+
+def _breaker(**overrides) -> CircuitBreaker:
+    options = {
+        "window": 10.0,
+        "min_calls": 4,
+        "failure_rate": 0.5,
+        "slow_call": 0.5,
+        "slow_rate": 0.8,
+        "open_seconds": 0.05,
+        "probes": 2,
+    }
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+async def _fail() -> None:
+    raise AutoReconnect("connection reset")
+
+
+async def _ok() -> str:
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_on_error_rate_and_fails_fast():
+    """Test that connection errors open the breaker and later calls fail fast."""
+    breaker = _breaker()
+    assert await breaker.call("test", _ok) == "ok"
+    assert await breaker.call("test", _ok) == "ok"
+    for _ in range(2):
+        with pytest.raises(DatabaseUnavailable):
+            await breaker.call("test", _fail)
+
+    assert breaker.state == OPEN
+    calls = []
+    with pytest.raises(DatabaseUnavailable):
+        await breaker.call("test", lambda: calls.append(1))
+    assert calls == []
+
+
+def test_breaker_opens_on_slow_calls():
+    """Test that a high share of slow calls opens the breaker."""
+    breaker = _breaker()
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(1.0, failed=False)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_half_open_probes_close_or_reopen():
+    """Test that probes close the breaker on success and reopen it on failure."""
+    breaker = _breaker()
+    breaker._open()
+    await asyncio.sleep(0.06)
+
+    with pytest.raises(DatabaseUnavailable):
+        await breaker.call("test", _fail)
+    assert breaker.state == OPEN
+
+    await asyncio.sleep(0.06)
+    assert await breaker.call("test", _ok) == "ok"
+    assert breaker.state == HALF_OPEN
+    assert await breaker.call("test", _ok) == "ok"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_server_errors_do_not_count_as_failures():
+    """Test that errors the server answered with leave the breaker closed."""
+    breaker = _breaker()
+
+    async def _duplicate() -> None:
+        raise DuplicateKeyError("duplicate")
+
+    for _ in range(5):
+        with pytest.raises(DuplicateKeyError):
+            await breaker.call("test", _duplicate)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_returns_503_not_401(database, monkeypatch):
+    """Test that an outage is reported as 503 rather than logging users out."""
+    from app.main import app
+
+    breaker = _breaker()
+    breaker._open()
+    monkeypatch.setattr(breaker, "open_seconds", 60)
+    monkeypatch.setattr(mongodb, "breaker", breaker)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        response = await client.get(
+            "/api/v1/users/me",
+            headers={"Authorization": f"Bearer {create_access_token('1' * 24)}"},
+        )
+        ready = await client.get("/api/v1/health/ready")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"]
+    assert ready.status_code == 503
+    assert ready.json()["circuit"] == OPEN
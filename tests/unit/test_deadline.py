@@ -0,0 +1,89 @@
+"""Test request deadlines."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core import deadline
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware, request_deadline
+
+
+async def _noop_app(scope, receive, send) -> None:
+    return None
+
+
+@pytest.mark.asyncio
+async def test_run_raises_when_deadline_already_passed():
+    """Test that no call is made once the deadline has expired."""
+    calls = []
+
+    async def _call() -> None:
+        calls.append(1)
+
+    token = request_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await deadline.run("test.expired", _call)
+    finally:
+        request_deadline.reset(token)
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_run_bounds_slow_operations():
+    """Test that a slow call is aborted at the deadline."""
+    token = request_deadline.set(time.monotonic() + 0.05)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await deadline.run("test.slow", lambda: asyncio.sleep(1))
+    finally:
+        request_deadline.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_run_without_deadline_is_unbounded():
+    """Test that calls outside a request run without a timeout."""
+    assert await deadline.run("test.unbounded", lambda: asyncio.sleep(0, "ok")) == "ok"
+
+
+def test_header_can_only_lower_timeout():
+    """Test that the timeout header lowers but never raises the deadline."""
+    middleware = DeadlineMiddleware(_noop_app)
+    scope = {"path": "/api/v1/users/me", "headers": []}
+    assert middleware.timeout_for(scope) == 25.0
+
+    scope["headers"] = [(b"x-request-timeout", b"2.5")]
+    assert middleware.timeout_for(scope) == 2.5
+
+    scope["headers"] = [(b"x-request-timeout", b"600")]
+    assert middleware.timeout_for(scope) == 25.0
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_request():
+    """Test that the handler is cancelled when the client goes away."""
+    cancelled = asyncio.Event()
+
+    async def slow_app(scope, receive, send) -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    messages = [
+        {"type": "http.request", "body": b"", "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        await asyncio.sleep(0.01)
+        return messages.pop(0)
+
+    async def send(message) -> None:
+        raise AssertionError("no response expected")
+
+    scope = {"type": "http", "path": "/", "headers": []}
+    await asyncio.wait_for(DeadlineMiddleware(slow_app)(scope, receive, send), 1)
+    assert cancelled.is_set()
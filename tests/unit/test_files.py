@@ -0,0 +1,143 @@
+"""Test streaming file uploads and downloads."""
+
+import hashlib
+import os
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.services.file_service import FileService, FileTooLarge, blob_path, temp_dir
+
+
+@pytest.fixture
+def database(database, tmp_path, monkeypatch):
+    """In-memory database, with uploads stored under a temporary directory."""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return database
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def _user(database, email: str) -> dict:
+    now = datetime.utcnow()
+    result = await database["users"].insert_one(
+        {
+            "email": email,
+            "full_name": "File Owner",
+            "hashed_password": "x",
+            "is_active": True,
+            "is_superuser": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    token = create_access_token(str(result.inserted_id))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_upload_is_hashed_and_deduplicated(database):
+    """Test that identical content is stored once and removed with its last file."""
+    service = FileService()
+    content = b"mars" * 1000
+
+    first = await service.upload(
+        "u1", "../../etc/a.txt", "text/plain", _chunks(content)
+    )
+    second = await service.upload(
+        "u2", "b.txt", None, _chunks(content[:7], content[7:])
+    )
+
+    assert first.sha256 == second.sha256 == hashlib.sha256(content).hexdigest()
+    assert first.filename == "a.txt" and first.size == len(content)
+    assert second.content_type == "application/octet-stream"
+    with open(blob_path(first.sha256), "rb") as blob:
+        assert blob.read() == content
+    assert os.listdir(temp_dir()) == []
+
+    assert await service.delete(first)
+    assert os.path.exists(blob_path(first.sha256))
+    assert await service.delete(second)
+    assert not os.path.exists(blob_path(first.sha256))
+
+
+@pytest.mark.asyncio
+async def test_delete_racing_an_upload_keeps_the_blob(database, monkeypatch):
+    """Test that content uploaded again mid-delete is not left without a blob."""
+    service = FileService()
+    content = b"race" * 100
+    first = await service.upload("u1", "a.txt", None, _chunks(content))
+    referenced = FileService._referenced
+    uploaded = []
+
+    async def upload_after_count(self, sha256):
+        found = await referenced(self, sha256)
+        if not uploaded:
+            # Deduplicated against the blob the delete is about to remove
+            uploaded.append(await service.upload("u2", "b.txt", None, _chunks(content)))
+        return found
+
+    monkeypatch.setattr(FileService, "_referenced", upload_after_count)
+    assert await service.delete(first)
+
+    with open(blob_path(first.sha256), "rb") as blob:
+        assert blob.read() == content
+    assert os.listdir(temp_dir()) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_over_limit_is_aborted(database, monkeypatch):
+    """Test that the size limit is enforced while streaming."""
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10)
+    service = FileService()
+
+    with pytest.raises(FileTooLarge):
+        await service.upload("u1", "big.bin", None, _chunks(b"x" * 6, b"x" * 6))
+
+    assert os.listdir(temp_dir()) == []
+    assert await database["files"].count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_upload_and_ranged_download(database):
+    """Test the upload endpoint, Range downloads and owner-only access."""
+    from app.main import app
+
+    owner = await _user(database, "owner@example.com")
+    other = await _user(database, "other@example.com")
+    content = bytes(range(256)) * 4
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        created = await client.post(
+            "/api/v1/files/?filename=data.bin",
+            content=content,
+            headers={**owner, "Content-Type": "application/octet-stream"},
+        )
+        file_id = created.json()["data"]["_id"]
+        ranged = await client.get(
+            f"/api/v1/files/{file_id}/content",
+            headers={**owner, "Range": "bytes=10-19"},
+        )
+        forbidden = await client.get(f"/api/v1/files/{file_id}/content", headers=other)
+        multipart = await client.post(
+            "/api/v1/files/?filename=data.bin",
+            files={"file": ("data.bin", content)},
+            headers=owner,
+        )
+
+    assert created.status_code == 201
+    assert created.json()["data"]["size"] == len(content)
+    assert ranged.status_code == 206
+    assert ranged.content == content[10:20]
+    assert ranged.headers["etag"] == f'"{hashlib.sha256(content).hexdigest()}"'
+    assert forbidden.status_code == 403
+    assert multipart.status_code == 415
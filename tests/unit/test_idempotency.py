@@ -0,0 +1,243 @@
+"""Test idempotency keys."""
+
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.security import create_access_token
+
+
+def _client(calls: list, status: int = 201, delay: float = 0) -> httpx.AsyncClient:
+    async def create(request):
+        calls.append(await request.json())
+        await asyncio.sleep(delay)
+        return JSONResponse({"n": len(calls)}, status_code=status)
+
+    app = Starlette(routes=[Route("/items", create, methods=["POST"])])
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(app))
+    return httpx.AsyncClient(transport=transport, base_url="http://localhost")
+
+
+async def _call(app, headers: list, messages: list) -> list:
+    """Send one raw ASGI request through the middleware, return what was sent."""
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/items",
+        "query_string": b"",
+        "headers": headers,
+    }
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await IdempotencyMiddleware(app)(scope, receive, send)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_response(database):
+    """Test that a retried key returns the first response without re-running."""
+    calls = []
+    async with _client(calls) as client:
+        headers = {"Idempotency-Key": "abc"}
+        first = await client.post("/items", json={"a": 1}, headers=headers)
+        second = await client.post("/items", json={"a": 1}, headers=headers)
+        other = await client.post(
+            "/items", json={"a": 1}, headers={"Idempotency-Key": "xyz"}
+        )
+
+    assert len(calls) == 2
+    assert second.status_code == 201 and second.json() == first.json() == {"n": 1}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert other.json() == {"n": 2}
+
+
+@pytest.mark.asyncio
+async def test_keys_are_scoped_to_the_principal(database):
+    """Test that two users sending the same key both run their request."""
+    calls = []
+    async with _client(calls) as client:
+        for user_id in ("user-a", "user-b"):
+            await client.post(
+                "/items",
+                json={},
+                headers={
+                    "Idempotency-Key": "same",
+                    "Authorization": f"Bearer {create_access_token(user_id)}",
+                },
+            )
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_reused_key_with_different_body_is_rejected(database):
+    """Test that a key cannot be reused for a different request."""
+    calls = []
+    headers = {
+        "Idempotency-Key": "k",
+        "Authorization": f"Bearer {create_access_token('user-a')}",
+    }
+    async with _client(calls) as client:
+        await client.post("/items", json={"a": 1}, headers=headers)
+        response = await client.post("/items", json={"a": 2}, headers=headers)
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_anonymous_keys_only_match_the_same_request(database):
+    """Test that anonymous callers reusing a key for other bodies all run."""
+    calls = []
+    async with _client(calls) as client:
+        first = await client.post(
+            "/items", json={"a": 1}, headers={"Idempotency-Key": "1"}
+        )
+        other = await client.post(
+            "/items", json={"a": 2}, headers={"Idempotency-Key": "1"}
+        )
+        retry = await client.post(
+            "/items", json={"a": 1}, headers={"Idempotency-Key": "1"}
+        )
+
+    assert calls == [{"a": 1}, {"a": 2}]
+    assert other.status_code == 201 and other.json() == {"n": 2}
+    assert retry.json() == first.json() == {"n": 1}
+
+
+@pytest.mark.asyncio
+async def test_large_chunked_body_runs_without_key(database, monkeypatch):
+    """Test that a chunked body over the limit reaches the app unchanged."""
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_BODY", 16)
+    payload = [b'{"data": "', b"x" * 20, b"x" * 20, b'"}']
+
+    async def chunks():
+        for chunk in payload:
+            yield chunk
+
+    calls = []
+    async with _client(calls) as client:
+        response = await client.post(
+            "/items", content=chunks(), headers={"Idempotency-Key": "big"}
+        )
+
+    assert response.status_code == 201
+    assert calls == [{"data": "x" * 40}]
+    assert await database["idempotency_keys"].count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_malformed_content_length_runs_without_key(database):
+    """Test that an unparsable Content-Length is left to the application."""
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(await receive())
+        await JSONResponse({}, status_code=400)(scope, receive, send)
+
+    sent = await _call(
+        app,
+        [(b"idempotency-key", b"k"), (b"content-length", b"abc")],
+        [{"type": "http.request", "body": b"{}", "more_body": False}],
+    )
+
+    assert len(calls) == 1 and sent[0]["status"] == 400
+    assert await database["idempotency_keys"].count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_receive_passes_through_after_the_body(database):
+    """Test that the app hears the client's own messages after the replay."""
+    received = []
+    messages = [
+        {"type": "http.request", "body": b"{}", "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+
+    async def app(scope, receive, send):
+        received.extend([await receive(), await receive()])
+        await JSONResponse({}, status_code=201)(scope, receive, send)
+
+    await _call(app, [(b"idempotency-key", b"k")], messages)
+
+    assert [message["type"] for message in received] == [
+        "http.request",
+        "http.disconnect",
+    ]
+    assert messages == []  # the disconnect came from the client
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_first(database):
+    """Test that a duplicate arriving mid-flight waits instead of re-running."""
+    calls = []
+    async with _client(calls, delay=0.2) as client:
+        responses = await asyncio.gather(
+            *(
+                client.post("/items", json={}, headers={"Idempotency-Key": "k"})
+                for _ in range(3)
+            )
+        )
+
+    assert len(calls) == 1
+    assert [response.json() for response in responses] == [{"n": 1}] * 3
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored(database):
+    """Test that a 5xx response releases the key so a retry runs again."""
+    calls = []
+    async with _client(calls, status=503) as client:
+        for _ in range(2):
+            await client.post("/items", json={}, headers={"Idempotency-Key": "k"})
+
+    assert len(calls) == 2
+    assert await database["idempotency_keys"].count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_create_user_replay_skips_user_service(database, monkeypatch):
+    """Test that a retried sign-up neither hashes nor queries users again."""
+    from app.main import app
+    from app.services.user_service import UserService
+
+    calls = []
+    create = UserService.create
+
+    async def counting_create(self, user_in):
+        calls.append(user_in.email)
+        return await create(self, user_in)
+
+    monkeypatch.setattr(UserService, "create", counting_create)
+    payload = {
+        "email": "retry@example.com",
+        "full_name": "Retry User",
+        "password": "retry-password",
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        responses = [
+            await client.post(
+                "/api/v1/users/", json=payload, headers={"Idempotency-Key": "signup"}
+            )
+            for _ in range(2)
+        ]
+
+    assert calls == ["retry@example.com"]
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[1].json() == responses[0].json()
+    assert responses[1].headers["idempotent-replayed"] == "true"
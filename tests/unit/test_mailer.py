@@ -0,0 +1,204 @@
+"""Test the pooled mailer and the account email flows."""
+
+import asyncio
+from datetime import datetime
+from email import message_from_bytes
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.mailer import Mailer, load_template, render
+from app.core.security import get_password_hash, verify_token
+
+
+class SMTPStandIn:
+    """Just enough of an SMTP server to receive mail in tests."""
+
+    def __init__(self):
+        self.messages: List[bytes] = []
+        self.connections = 0
+        # Replies to DATA, used up one per message before answering 250
+        self.data_replies: List[bytes] = []
+        self.server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        settings.SMTP_PORT = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        writer.write(b"220 stand-in ready\r\n")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                break
+            if command == b"DATA":
+                writer.write(b"354 go ahead\r\n")
+                await writer.drain()
+                body = []
+                while (line := await reader.readline()) != b".\r\n":
+                    body.append(line)
+                if self.data_replies:
+                    writer.write(self.data_replies.pop(0))
+                else:
+                    self.messages.append(b"".join(body))
+                    writer.write(b"250 queued\r\n")
+            else:
+                # EHLO/HELO, MAIL, RCPT, RSET, NOOP
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """SMTP stand-in configured as the mail server; listens once started."""
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", None)
+    monkeypatch.setattr(settings, "SMTP_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", None)
+    monkeypatch.setattr(settings, "EMAILS_FROM_EMAIL", "noreply@example.com")
+    monkeypatch.setattr(settings, "MAIL_RETRY_BACKOFF", 0.01)
+    return SMTPStandIn()
+
+
+def _context(**overrides) -> dict:
+    context = {
+        "full_name": "Ada",
+        "link": "https://example.com/verify-email?token=t",
+        "expire_hours": 48,
+        "project_name": "Mars Landing",
+    }
+    context.update(overrides)
+    return context
+
+
+def test_templates_are_parsed_once_and_escaped():
+    """Test that templates are cached and values are escaped in HTML only."""
+    load_template.cache_clear()
+    message = render("verify_email", "ada@example.com", _context(full_name="<Ada>"))
+    render("verify_email", "bob@example.com", _context())
+
+    assert load_template.cache_info().misses == 1
+    assert message["Subject"] == "Verify your email for Mars Landing"
+    text, html = (part.get_content() for part in message.iter_parts())
+    assert "Hi <Ada>," in text
+    assert "Hi &lt;Ada&gt;," in html
+
+
+@pytest.mark.asyncio
+async def test_queued_emails_share_pooled_connections(smtp_server, monkeypatch):
+    """Test that a burst of emails goes out over the pool's connections."""
+    monkeypatch.setattr(settings, "MAIL_POOL_SIZE", 2)
+    await smtp_server.start()
+    mailer = Mailer()
+    mailer.start()
+    for i in range(25):
+        assert mailer.send("verify_email", f"user{i}@example.com", **_context())
+    await mailer.close()
+    await smtp_server.stop()
+
+    assert len(smtp_server.messages) == 25
+    assert smtp_server.connections <= 2
+    recipients = {message_from_bytes(raw)["To"] for raw in smtp_server.messages}
+    assert recipients == {f"user{i}@example.com" for i in range(25)}
+
+
+@pytest.mark.asyncio
+async def test_temporary_failures_are_retried(smtp_server, monkeypatch):
+    """Test that 4xx replies are retried and 5xx replies are not."""
+    # One connection, so the scripted replies reach the messages in order
+    monkeypatch.setattr(settings, "MAIL_POOL_SIZE", 1)
+    await smtp_server.start()
+    mailer = Mailer()
+    mailer.start()
+    smtp_server.data_replies = [b"451 try later\r\n", b"451 try later\r\n"]
+    mailer.send("verify_email", "retry@example.com", **_context())
+    await mailer.close()
+    assert len(smtp_server.messages) == 1
+
+    mailer.start()
+    smtp_server.data_replies = [b"550 no such user\r\n"]
+    mailer.send("verify_email", "gone@example.com", **_context())
+    mailer.send("verify_email", "next@example.com", **_context())
+    await mailer.close()
+    await smtp_server.stop()
+    assert [message_from_bytes(raw)["To"] for raw in smtp_server.messages] == [
+        "retry@example.com",
+        "next@example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_instead_of_blocking(smtp_server, monkeypatch):
+    """Test that sends beyond the queue size are refused straight away."""
+    monkeypatch.setattr(settings, "MAIL_QUEUE_SIZE", 1)
+    await smtp_server.start()
+    mailer = Mailer()
+    mailer.start()
+
+    assert mailer.send("verify_email", "a@example.com", **_context())
+    assert not mailer.send("verify_email", "b@example.com", **_context())
+    await mailer.close()
+    await smtp_server.stop()
+
+
+@pytest.mark.asyncio
+async def test_password_reset_flow(database, monkeypatch):
+    """Test that a reset link sets the password once and never logs anyone in."""
+    from app.main import app
+
+    sent = []
+    monkeypatch.setattr(
+        "app.core.mailer.mailer.send",
+        lambda template, to, **context: sent.append((template, to, context)),
+    )
+    now = datetime.utcnow()
+    await database["users"].insert_one(
+        {
+            "email": "reset@example.com",
+            "full_name": "Reset User",
+            "hashed_password": get_password_hash("old-password"),
+            "is_active": True,
+            "is_superuser": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        unknown = await client.post(
+            "/api/v1/auth/password-recovery", json={"email": "nobody@example.com"}
+        )
+        known = await client.post(
+            "/api/v1/auth/password-recovery", json={"email": "reset@example.com"}
+        )
+        token = parse_qs(urlparse(sent[0][2]["link"]).query)["token"][0]
+        reset = {"token": token, "new_password": "new-password"}
+        first = await client.post("/api/v1/auth/reset-password", json=reset)
+        again = await client.post("/api/v1/auth/reset-password", json=reset)
+        login = await client.post(
+            "/api/v1/auth/login",
+            data={"username": "reset@example.com", "password": "new-password"},
+        )
+
+    assert unknown.status_code == known.status_code == 202
+    assert unknown.json() == known.json()
+    assert [(template, to) for template, to, _ in sent] == [
+        ("reset_password", "reset@example.com")
+    ]
+    assert verify_token(token) is None
+    assert first.status_code == 200
+    assert again.status_code == 400
+    assert login.status_code == 200
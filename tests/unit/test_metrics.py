@@ -0,0 +1,96 @@
+"""Test multiprocess metrics collection and scrape caching."""
+
+import gzip
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.registry import CollectorRegistry
+
+from app.core import metrics
+from app.core.metrics import MetricsApp, collect_dead_workers
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _write(path, filename: str, name: str, value: float) -> None:
+    values = MmapedDict(os.path.join(path, filename))
+    values.write_value(mmap_key(name, name, [], [], ""), value, 0.0)
+    values.close()
+
+
+def _samples(path) -> dict:
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, str(path))
+    return {
+        sample.name: sample.value
+        for family in registry.collect()
+        for sample in family.samples
+    }
+
+
+def test_dead_workers_are_folded_into_archive(tmp_path):
+    """Test that dead workers' counters survive and their live gauges go."""
+    first, second = _dead_pid(), _dead_pid()
+    _write(tmp_path, f"counter_{first}.db", "jobs_total", 3)
+    _write(tmp_path, f"counter_{second}.db", "jobs_total", 4)
+    _write(tmp_path, f"counter_{os.getpid()}.db", "jobs_total", 5)
+    _write(tmp_path, f"gauge_livesum_{first}.db", "busy", 1)
+
+    assert collect_dead_workers(str(tmp_path)) == 2
+
+    assert set(os.listdir(tmp_path)) == {
+        ".lock",
+        "counter_archive.db",
+        f"counter_{os.getpid()}.db",
+    }
+    samples = _samples(tmp_path)
+    assert samples["jobs_total"] == 12
+    assert "busy" not in samples
+
+    # Later deaths add to the archive instead of replacing it
+    third = _dead_pid()
+    _write(tmp_path, f"counter_{third}.db", "jobs_total", 1)
+    assert collect_dead_workers(str(tmp_path)) == 1
+    assert _samples(tmp_path)["jobs_total"] == 13
+    assert collect_dead_workers(str(tmp_path)) == 0
+
+
+def test_scrapes_are_cached(monkeypatch):
+    """Test that scrapes within the cache interval reuse one render."""
+    renders = []
+
+    def render() -> bytes:
+        renders.append(1)
+        return f"jobs_total {len(renders)}\n".encode()
+
+    monkeypatch.setattr(metrics, "render", render)
+    app = MetricsApp(cache_seconds=60)
+
+    assert app.output(compress=False) == b"jobs_total 1\n"
+    assert gzip.decompress(app.output(compress=True)) == b"jobs_total 1\n"
+    assert len(renders) == 1
+
+    app.cache_seconds = 0
+    assert app.output(compress=False) == b"jobs_total 2\n"
+
+
+@pytest.mark.asyncio
+async def test_metrics_app_serves_prometheus_text():
+    """Test that the metrics app answers scrapes, gzipped when accepted."""
+    transport = httpx.ASGITransport(app=MetricsApp(cache_seconds=0))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["content-encoding"] == "gzip"
+    assert b"# TYPE" in response.content
@@ -0,0 +1,204 @@
+"""Test the batched data-migration runner."""
+
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from app.core.config import settings
+from app.db.migrations import MIGRATIONS, MigrationLocked, MigrationRunner
+from app.db.migrations.users import BackfillUserSearchFields
+from app.db.mongodb import DatabaseUnavailable
+
+
+@pytest.fixture
+def database(database, monkeypatch):
+    """Mock database with unthrottled migrations."""
+    # The fake's bulk API predates the ``sort`` option pymongo now passes
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(
+        mongomock.collection.BulkOperationBuilder,
+        "add_update",
+        add_update_without_sort,
+    )
+    monkeypatch.setattr(settings, "MIGRATION_BATCH_PAUSE", 0.0)
+    return database
+
+
+async def _insert_users(database, count: int) -> None:
+    await database["users"].insert_many(
+        [
+            {"email": f"User{i}@Example.com", "full_name": f"Ünïcode User {i}"}
+            for i in range(count)
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_migrations_backfill_and_complete(database):
+    """Test that pending migrations are applied in batches and recorded."""
+    await _insert_users(database, 7)
+    await database["users"].update_one(
+        {"email": "User0@Example.com"}, {"$set": {"email_verified": True}}
+    )
+    runner = MigrationRunner(MIGRATIONS, batch_size=3)
+
+    records = await runner.run(target=3)
+
+    users = await database["users"].find().to_list(length=None)
+    assert all(user["search_email"] == user["email"].lower() for user in users)
+    assert all(user["search_name"].startswith("unicode user") for user in users)
+    assert sum(user["email_verified"] for user in users) == 1
+    assert [record["_id"] for record in records] == [1, 2, 3]
+    assert all(record["state"] == "completed" for record in records)
+    assert (records[0]["processed"], records[0]["modified"]) == (7, 7)
+    assert (records[2]["processed"], records[2]["modified"]) == (6, 6)
+    assert await runner.pending() == []
+    assert await runner.run() == []
+
+
+@pytest.mark.asyncio
+async def test_interrupted_migration_resumes(database, monkeypatch):
+    """Test that a crashed run continues after the last saved batch."""
+    await _insert_users(database, 5)
+    migration = BackfillUserSearchFields()
+    crashed = MigrationRunner([migration], batch_size=2)
+    save = crashed._save
+
+    async def crash_after_first_batch(*args):
+        await save(*args)
+        raise RuntimeError("crashed")
+
+    monkeypatch.setattr(crashed, "_save", crash_after_first_batch)
+    with pytest.raises(RuntimeError):
+        await crashed.apply(migration)
+
+    # Held by the crashed runner until its heartbeat goes stale
+    with pytest.raises(MigrationLocked):
+        await MigrationRunner([migration], batch_size=2).apply(migration)
+
+    estimate = await MigrationRunner([migration], batch_size=2).estimate(migration)
+    assert (estimate["state"], estimate["pending"], estimate["batches"]) == (
+        "running",
+        3,
+        2,
+    )
+    assert estimate["estimated_seconds"] >= 0
+
+    record = await MigrationRunner([migration], batch_size=2, force=True).apply(
+        migration
+    )
+    assert (record["state"], record["processed"]) == ("completed", 5)
+    assert await database["users"].count_documents(migration.query()) == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_lock_is_taken_over(database):
+    """Test that a runner whose heartbeat stopped no longer blocks others."""
+    await _insert_users(database, 2)
+    migration = BackfillUserSearchFields()
+    await database["migrations"].insert_one(
+        {
+            "_id": migration.version,
+            "state": "running",
+            "owner": "gone:1",
+            "heartbeat_at": datetime.utcnow()
+            - timedelta(seconds=settings.MIGRATION_LOCK_TIMEOUT + 1),
+            "last_id": None,
+            "processed": 0,
+            "modified": 0,
+        }
+    )
+
+    record = await MigrationRunner([migration]).apply(migration)
+
+    assert (record["state"], record["processed"]) == ("completed", 2)
+
+
+@pytest.mark.asyncio
+async def test_takeover_before_completion_raises_locked(database, monkeypatch):
+    """Test that losing the claim after the last batch is reported as locked."""
+    await _insert_users(database, 2)
+    migration = BackfillUserSearchFields()
+    runner = MigrationRunner([migration], batch_size=10)
+    save = runner._save
+
+    async def save_then_lose_claim(*args):
+        await save(*args)
+        await database["migrations"].update_one(
+            {"_id": migration.version}, {"$set": {"owner": "other:1"}}
+        )
+
+    monkeypatch.setattr(runner, "_save", save_then_lose_claim)
+    with pytest.raises(MigrationLocked):
+        await runner.apply(migration)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_is_kept_while_database_is_unavailable(database, monkeypatch):
+    """Test that waiting out an open circuit breaker keeps the claim fresh."""
+    monkeypatch.setattr(settings, "MONGODB_BREAKER_OPEN_SECONDS", 0)
+    await _insert_users(database, 2)
+    migration = BackfillUserSearchFields()
+    runner = MigrationRunner([migration])
+    read_batch = runner._read_batch
+    old = datetime.utcnow() - timedelta(hours=1)
+    heartbeats = []
+
+    async def unavailable_once(*args):
+        record = await database["migrations"].find_one({"_id": migration.version})
+        if not heartbeats:
+            heartbeats.append(old)
+            await database["migrations"].update_one(
+                {"_id": migration.version}, {"$set": {"heartbeat_at": old}}
+            )
+            raise DatabaseUnavailable()
+        heartbeats.append(record["heartbeat_at"])
+        return await read_batch(*args)
+
+    monkeypatch.setattr(runner, "_read_batch", unavailable_once)
+    record = await runner.apply(migration)
+
+    assert record["processed"] == 2
+    assert heartbeats[1] > old
+
+
+@pytest.mark.asyncio
+async def test_lost_connection_while_saving_resumes(database, monkeypatch):
+    """Test that a failed progress save waits, resumes and loses no counts."""
+    monkeypatch.setattr(settings, "MONGODB_BREAKER_OPEN_SECONDS", 0)
+    await _insert_users(database, 5)
+    migration = BackfillUserSearchFields()
+    runner = MigrationRunner([migration], batch_size=2)
+    update_one = runner.progress.update_one
+    failures = []
+
+    async def fail_first_save(query, update, **kwargs):
+        if "$inc" in update and not failures:
+            failures.append(update)
+            raise AutoReconnect("connection reset")
+        return await update_one(query, update, **kwargs)
+
+    monkeypatch.setattr(runner.progress, "update_one", fail_first_save)
+    record = await runner.apply(migration)
+
+    assert len(failures) == 1
+    assert (record["state"], record["processed"], record["modified"]) == (
+        "completed",
+        5,
+        5,
+    )
+    assert await database["users"].count_documents(migration.query()) == 0
+
+
+def test_pause_scales_with_batch_time(database):
+    """Test that slow batches are followed by proportionally longer pauses."""
+    runner = MigrationRunner(MIGRATIONS, pause=0.1, duty_cycle=0.25)
+
+    assert runner.pause_after(0.01) == 0.1
+    assert runner.pause_after(1.0) == pytest.approx(3.0)
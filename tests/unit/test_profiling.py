@@ -0,0 +1,116 @@
+"""Test the sampling profiler."""
+
+import threading
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.profiling import (
+    ProfileStore,
+    ProfilingMiddleware,
+    RequestProfile,
+    StackSampler,
+    profile_store,
+)
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler_collects_folded_stacks():
+    """Test that samples of a busy thread are folded root-first."""
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        sampler = StackSampler(0.001, thread_id=worker.ident).start()
+        time.sleep(0.05)
+        sampler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sampler.samples
+    assert sampler.duration > 0
+    for line in sampler.collapsed().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.startswith("threading:")
+    assert "_busy_loop" in sampler.collapsed()
+
+
+def test_profile_store_evicts_oldest():
+    """Test that the store keeps only the most recent profiles."""
+    store = ProfileStore(max_size=2)
+    for profile_id in ("a", "b", "c"):
+        store.add(
+            RequestProfile(
+                id=profile_id,
+                method="GET",
+                path="/",
+                duration=0.1,
+                sample_count=1,
+                collapsed="main 1",
+            )
+        )
+
+    assert store.get("a") is None
+    assert [profile.id for profile in store.list()] == ["c", "b"]
+
+
+def _profiled_app() -> ProfilingMiddleware:
+    async def hello(request):
+        return PlainTextResponse("hello")
+
+    return ProfilingMiddleware(Starlette(routes=[Route("/hello", hello)]))
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    """Header-token profiling with random sampling off."""
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "s3cret")
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "PROFILING_MAX_CONCURRENT", 4)
+
+
+def test_should_profile_requires_the_token(profiling, monkeypatch):
+    """Test that only the configured token selects a request."""
+    middleware = _profiled_app()
+
+    def scope(*headers):
+        return {"type": "http", "headers": list(headers)}
+
+    assert middleware.should_profile(scope((b"x-profile", b"s3cret")))
+    assert not middleware.should_profile(scope((b"x-profile", b"guess")))
+    assert not middleware.should_profile(scope())
+
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", None)
+    assert not middleware.should_profile(scope((b"x-profile", b"s3cret")))
+
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "s3cret")
+    middleware.active = settings.PROFILING_MAX_CONCURRENT
+    assert not middleware.should_profile(scope((b"x-profile", b"s3cret")))
+
+
+@pytest.mark.asyncio
+async def test_middleware_profiles_selected_requests(profiling):
+    """Test that a profiled request is stored and others pass untouched."""
+    transport = httpx.ASGITransport(app=_profiled_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        profiled = await client.get("/hello", headers={"X-Profile": "s3cret"})
+        plain = await client.get("/hello", headers={"X-Profile": "wrong"})
+
+    assert profiled.text == plain.text == "hello"
+    assert "x-profile-id" not in plain.headers
+    profile = profile_store.get(profiled.headers["x-profile-id"])
+    assert profile is not None
+    assert (profile.method, profile.path) == ("GET", "/hello")
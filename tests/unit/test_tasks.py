@@ -0,0 +1,163 @@
+"""Test background tasks in eager mode."""
+
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from app.core.celery import celery_app, run_async
+from app.core.config import settings
+from app.services.file_service import _retire, blob_path, temp_dir
+from app.tasks.maintenance import cleanup_exports, cleanup_partial_uploads
+from app.tasks.users import (
+    archive_inactive_users,
+    bulk_user_action,
+    export_path,
+    export_users,
+)
+
+
+@pytest.fixture
+def eager_tasks(database, tmp_path, monkeypatch):
+    """Run tasks inline against an in-memory database."""
+    celery_app.conf.update(
+        task_always_eager=True,
+        broker_url="memory://",
+        result_backend="cache+memory://",
+    )
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    yield database
+
+
+def _seed(database, count: int) -> list:
+    async def _insert() -> list:
+        result = await database["users"].insert_many(
+            [
+                {
+                    "email": f"user{i}@example.com",
+                    "full_name": f"User {i}",
+                    "hashed_password": "x",
+                    "is_active": True,
+                    "is_superuser": False,
+                    "created_at": datetime(2024, 1, 1),
+                    "updated_at": datetime(2024, 1, 1),
+                }
+                for i in range(count)
+            ]
+        )
+        return [str(_id) for _id in result.inserted_ids]
+
+    return run_async(_insert)
+
+
+def test_bulk_user_action_by_ids(eager_tasks):
+    """Test that the bulk task deactivates the listed users."""
+    user_ids = _seed(eager_tasks, 3)
+
+    result = bulk_user_action.delay({"ids": user_ids[:2]}, "deactivate").get()
+
+    assert result == {"matched": 2, "changed": 2, "action": "deactivate"}
+    active = run_async(eager_tasks["users"].count_documents, {"is_active": True})
+    assert active == 1
+
+
+def test_bulk_user_action_by_filter_in_chunks(eager_tasks, monkeypatch):
+    """Test filter-based deletes across several chunks, sparing excluded ids."""
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 2)
+    user_ids = _seed(eager_tasks, 5)
+    run_async(
+        eager_tasks["users"].update_one,
+        {"email": "user4@example.com"},
+        {"$set": {"email": "user4@other.example.org"}},
+    )
+
+    result = bulk_user_action.delay(
+        {"email_domain": "EXAMPLE.com"}, "delete", [user_ids[0]]
+    ).get()
+
+    assert result["matched"] == 3
+    assert result["changed"] == 3
+    remaining = run_async(eager_tasks["users"].distinct, "email")
+    assert sorted(remaining) == ["user0@example.com", "user4@other.example.org"]
+
+
+def test_export_users(eager_tasks):
+    """Test that the export task writes one CSV row per user."""
+    _seed(eager_tasks, 5)
+
+    async_result = export_users.delay()
+    result = async_result.get()
+
+    assert result["count"] == 5
+    with open(export_path(async_result.id)) as handle:
+        lines = handle.read().splitlines()
+    assert lines[0].startswith("id,email")
+    assert len(lines) == 6
+    assert "hashed_password" not in lines[0]
+
+
+def test_archive_inactive_users(eager_tasks, monkeypatch):
+    """Test that the archival task moves inactive users in batches."""
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "ARCHIVE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "ARCHIVE_BATCH_PAUSE", 0)
+    _seed(eager_tasks, 5)
+    run_async(
+        eager_tasks["users"].update_one,
+        {"email": "user0@example.com"},
+        {"$set": {"last_login_at": datetime.utcnow()}},
+    )
+
+    assert archive_inactive_users.delay().get() == {"archived": 4, "enabled": True}
+    assert run_async(eager_tasks["users"].distinct, "email") == ["user0@example.com"]
+    assert run_async(eager_tasks["users_archive"].count_documents, {}) == 4
+
+
+def test_cleanup_exports_removes_expired_files(eager_tasks):
+    """Test that exports older than the retention period are removed."""
+    directory = os.path.dirname(export_path("old"))
+    os.makedirs(directory)
+    for name in ("old", "new"):
+        open(export_path(name), "w").close()
+    os.utime(export_path("old"), (0, 0))
+
+    assert cleanup_exports.delay().get() == {"removed": 1}
+    assert os.listdir(directory) == [os.path.basename(export_path("new"))]
+
+
+def test_cleanup_partial_uploads_removes_abandoned_files(eager_tasks):
+    """Test that stale partial uploads are removed and fresh ones kept."""
+    os.makedirs(temp_dir())
+    for name in ("old.part", "new.part"):
+        open(os.path.join(temp_dir(), name), "w").close()
+    os.utime(os.path.join(temp_dir(), "old.part"), (0, 0))
+
+    assert cleanup_partial_uploads.delay().get() == {"removed": 1}
+    assert os.listdir(temp_dir()) == ["new.part"]
+
+
+def test_cleanup_partial_uploads_keeps_blobs_being_deleted(eager_tasks):
+    """Test that an old blob moved aside for deletion is not taken as stale."""
+    sha256 = "ab" * 32
+    os.makedirs(os.path.dirname(blob_path(sha256)))
+    open(blob_path(sha256), "w").close()
+    os.utime(blob_path(sha256), (0, 0))
+
+    retired = _retire(sha256)
+
+    assert cleanup_partial_uploads.delay().get() == {"removed": 0}
+    assert retired is not None and os.path.exists(retired)
+
+
+def test_run_async_rejects_running_loop():
+    """Test that run_async refuses to nest inside an event loop."""
+
+    async def _nested() -> None:
+        async def _noop() -> None:
+            return None
+
+        run_async(_noop)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_nested())
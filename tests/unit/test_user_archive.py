@@ -0,0 +1,109 @@
+"""Test archival and on-demand restore of inactive users."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.security import get_password_hash
+from app.services.user_service import UserService
+
+PASSWORD = "archive-password"
+OLD = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def user_service(database):
+    """User service backed by an in-memory database."""
+    return UserService()
+
+
+async def _insert(service: UserService, email: str, **fields) -> None:
+    doc = {
+        "email": email,
+        "full_name": email.split("@")[0],
+        "hashed_password": "x",
+        "is_active": True,
+        "is_superuser": False,
+        "created_at": OLD,
+        "updated_at": OLD,
+    }
+    doc.update(fields)
+    await service.collection.insert_one(doc)
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_only_inactive_users(user_service):
+    """Test that recent logins, recent updates and superusers stay hot."""
+    now = datetime.utcnow()
+    await _insert(user_service, "idle@example.com")
+    await _insert(user_service, "old-login@example.com", last_login_at=OLD)
+    await _insert(user_service, "login@example.com", last_login_at=now)
+    await _insert(user_service, "updated@example.com", updated_at=now)
+    await _insert(user_service, "admin@example.com", is_superuser=True)
+
+    archived = await user_service.archive_inactive(
+        now - timedelta(days=365), batch_size=1
+    )
+
+    assert archived == 2
+    assert sorted(await user_service.archive.distinct("email")) == [
+        "idle@example.com",
+        "old-login@example.com",
+    ]
+    assert sorted(await user_service.collection.distinct("email")) == [
+        "admin@example.com",
+        "login@example.com",
+        "updated@example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_by_email_restores_archived_user(user_service):
+    """Test that a lookup falls back to the archive and restores the user."""
+    await _insert(user_service, "idle@example.com")
+    await user_service.archive_inactive(datetime.utcnow())
+
+    user = await user_service.get_by_email("idle@example.com")
+
+    assert user is not None and user.email == "idle@example.com"
+    assert await user_service.archive.count_documents({}) == 0
+    restored = await user_service.collection.find_one({"email": "idle@example.com"})
+    assert "archived_at" not in restored
+    # Restored users are not archived again by the next nightly run
+    cutoff = datetime.utcnow() - timedelta(days=365)
+    assert await user_service.archive_inactive(cutoff) == 0
+
+
+@pytest.mark.asyncio
+async def test_authenticate_restores_and_records_login(user_service):
+    """Test that logging in restores an archived user and records the login."""
+    await _insert(
+        user_service, "idle@example.com", hashed_password=get_password_hash(PASSWORD)
+    )
+    await user_service.archive_inactive(datetime.utcnow())
+
+    user = await user_service.authenticate("idle@example.com", PASSWORD)
+
+    assert user is not None
+    doc = await user_service.collection.find_one({"email": "idle@example.com"})
+    assert doc["last_login_at"] > OLD
+    assert await user_service.get_by_email("missing@example.com") is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_actions_and_delete_reach_archived_users(user_service):
+    """Test that archived users are counted, changed and deleted in place."""
+    await _insert(user_service, "idle@partner.example.com")
+    await _insert(user_service, "gone@partner.example.com")
+    await user_service.archive_inactive(datetime.utcnow())
+    await _insert(user_service, "hot@partner.example.com")
+    query = {"email": {"$regex": "@partner\\.example\\.com$"}}
+
+    assert await user_service.count(query) == 3
+    assert await user_service.bulk_apply(query, "deactivate", chunk_size=1) == 3
+    gone = await user_service.archive.find_one({"email": "gone@partner.example.com"})
+    assert await user_service.delete(str(gone["_id"]))
+
+    assert await user_service.get_by_email("gone@partner.example.com") is None
+    restored = await user_service.get_by_email("idle@partner.example.com")
+    assert restored is not None and restored.is_active is False
@@ -0,0 +1,89 @@
+"""Test indexed user search."""
+
+from datetime import datetime
+
+import pytest
+
+from app.services.user_service import UserService, search_fields
+from app.utils.text import normalize_search_text
+
+NAMES = ["José Álvarez", "Joan Smith", "joan smith", "Jonas Brand", "Mary Jones"]
+
+
+@pytest.fixture
+def user_service(database):
+    """User service backed by an in-memory database."""
+    return UserService()
+
+
+async def _seed(service: UserService) -> None:
+    now = datetime(2024, 1, 1)
+    docs = []
+    for i, name in enumerate(NAMES):
+        doc = {
+            "email": f"User{i}@Example.com",
+            "full_name": name,
+            "hashed_password": "x",
+            "is_active": True,
+            "is_superuser": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        doc.update(search_fields(doc))
+        docs.append(doc)
+    await service.collection.insert_many(docs)
+
+
+def test_normalize_search_text():
+    """Test that accents, case and whitespace are normalized."""
+    assert normalize_search_text("  José   ÁLVAREZ ") == "jose alvarez"
+
+
+@pytest.mark.asyncio
+async def test_search_by_name_prefix(user_service):
+    """Test that name search is an accent- and case-insensitive prefix match."""
+    await _seed(user_service)
+
+    users, next_cursor = await user_service.search("JO")
+
+    assert [user.full_name for user in users] == [
+        "Joan Smith",
+        "joan smith",
+        "Jonas Brand",
+        "José Álvarez",
+    ]
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_search_pages_with_keyset_cursor(user_service):
+    """Test that paging visits every match once, across equal keys."""
+    await _seed(user_service)
+
+    seen = []
+    cursor = None
+    while True:
+        users, cursor = await user_service.search("jo", limit=1, cursor=cursor)
+        seen.extend(str(user.id) for user in users)
+        if cursor is None:
+            break
+
+    assert len(seen) == 4
+    assert len(set(seen)) == 4
+
+
+@pytest.mark.asyncio
+async def test_search_by_email_prefix(user_service):
+    """Test that email search is case-insensitive."""
+    await _seed(user_service)
+
+    users, _ = await user_service.search("USER3@", field="email")
+
+    assert [user.full_name for user in users] == ["Jonas Brand"]
+
+
+@pytest.mark.asyncio
+async def test_search_rejects_malformed_cursor(user_service):
+    """Test that a tampered cursor is reported as a ValueError."""
+    with pytest.raises(ValueError):
+        await user_service.search("jo", cursor="not-a-cursor")